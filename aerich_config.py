@@ -0,0 +1,8 @@
+"""
+aerich entry point (pyproject.toml [tool.aerich]). Imported by aerich only,
+so database config is not built when settings are imported.
+"""
+
+from settings import Settings
+
+TORTOISE_ORM: dict = Settings().db_config
@@ -0,0 +1,64 @@
+"""
+Compares grid point lookup used by DiscordUseCase.searching_index_in_file:
+full distance field with numpy.argmin vs GridIndex.
+
+usage: python -m benchmarks.bench_grid_index
+"""
+
+import timeit
+from typing import Tuple
+
+import numpy
+from numpy import ndarray
+
+from utils.grid_index import GridIndex
+
+SHAPE: Tuple[int, int] = (616, 448)
+QUERIES: int = 200
+
+
+def meteo_grid() -> ndarray:
+    """Rotated lat/long grid with the same shape and extent as UM .bin matrix"""
+
+    rows, columns = numpy.indices(SHAPE).astype(float)
+    latitude: ndarray = 44.0 + rows * 0.026 + columns * 0.004
+    longitude: ndarray = 8.0 + columns * 0.042 - rows * 0.005
+    return numpy.stack([latitude, longitude], axis=-1)
+
+
+def brute_force(long: float, lat: float, array: ndarray) -> Tuple[int, int]:
+    distance: ndarray = numpy.sqrt(
+        (array[:, :, 1] - long) ** 2 + (array[:, :, 0] - lat) ** 2
+    )
+    row, column = numpy.unravel_index(numpy.argmin(distance), distance.shape)
+    return int(row), int(column)
+
+
+def main() -> None:
+    array: ndarray = meteo_grid()
+    random: numpy.random.Generator = numpy.random.default_rng(0)
+    queries: ndarray = numpy.column_stack(
+        [random.uniform(49.0, 55.0, QUERIES), random.uniform(14.0, 24.0, QUERIES)]
+    )
+
+    build: float = timeit.timeit(lambda: GridIndex(array), number=5) / 5
+    index: GridIndex = GridIndex(array)
+
+    for lat, long in queries:
+        assert index.nearest(lat=lat, long=long) == brute_force(long, lat, array)
+
+    brute: float = timeit.timeit(
+        lambda: [brute_force(long, lat, array) for lat, long in queries], number=3
+    ) / (3 * QUERIES)
+    indexed: float = timeit.timeit(
+        lambda: [index.nearest(lat=lat, long=long) for lat, long in queries], number=3
+    ) / (3 * QUERIES)
+
+    print(f"index build:        {build * 1000:8.2f} ms (once per matrix)")
+    print(f"argmin lookup:      {brute * 1000:8.3f} ms")
+    print(f"GridIndex lookup:   {indexed * 1000:8.3f} ms")
+    print(f"speedup:            {brute / indexed:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares ICM page parsing used by APIRepo.scrape_grid_points:
+BeautifulSoup (lxml) trees vs precompiled patterns from repos.parsers.
+Pages are taken from tests fixtures.
+
+usage: python -m benchmarks.bench_icm_parser
+"""
+
+import re
+import timeit
+import tracemalloc
+from typing import Callable, List, Tuple
+
+import bs4
+
+from repos.parsers import parse_mgram_id, parse_grid_points
+from repos.repo_types import Coords2Points
+
+FIXTURES: str = "tests/fixtures/template/{name}.html"
+NUMBER: int = 500
+
+
+def read_fixture(name: str) -> bytes:
+    with open(FIXTURES.format(name=name), "rb") as f:
+        return f.read()
+
+
+def soup_parse(search_page: bytes, meteogram_page: bytes) -> Coords2Points:
+    """Previous implementation of APIRepo.get_icm_result parsing"""
+
+    parse_response = bs4.BeautifulSoup(search_page.decode("iso-8859-2"), "lxml")
+    hrefs: list = list(parse_response.find_all(href=True))
+    id_result: list = [
+        re.findall("[0-9]+", str(element))
+        for element in hrefs
+        if "show_mgram" in str(element)
+    ][0]
+    assert id_result[0]
+
+    get_soup = bs4.BeautifulSoup(meteogram_page.decode("iso-8859-2"), "lxml")
+    scripts: List[str] = str(get_soup.find_all(language=True)).split(";")
+    var_act_x: list = [re.findall("[0-9]+", el) for el in scripts if "var act_x" in el]
+    var_act_y: list = [re.findall("[0-9]+", el) for el in scripts if "var act_y" in el]
+    return Coords2Points(act_x=int(var_act_x[0][0]), act_y=int(var_act_y[0][0]))
+
+
+def regex_parse(search_page: bytes, meteogram_page: bytes) -> Coords2Points:
+    assert parse_mgram_id(search_page)
+    return parse_grid_points(meteogram_page)
+
+
+def measure(parser: Callable, *pages: bytes) -> Tuple[float, int]:
+    """Mean time per parse and peak of allocated memory"""
+
+    seconds: float = timeit.timeit(lambda: parser(*pages), number=NUMBER) / NUMBER
+    tracemalloc.start()
+    parser(*pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    pages: Tuple[bytes, bytes] = read_fixture("search_res"), read_fixture("response")
+    assert soup_parse(*pages) == regex_parse(*pages)
+
+    soup_time, soup_peak = measure(soup_parse, *pages)
+    regex_time, regex_peak = measure(regex_parse, *pages)
+
+    print(
+        f"BeautifulSoup: {soup_time * 1e6:10.1f} us, peak {soup_peak / 1024:8.1f} KiB"
+    )
+    print(
+        f"regex:         {regex_time * 1e6:10.1f} us, peak {regex_peak / 1024:8.1f} KiB"
+    )
+    print(f"speedup:       {soup_time / regex_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
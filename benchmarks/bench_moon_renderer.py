@@ -0,0 +1,39 @@
+"""
+Renders Moon images for a whole year with MoonRenderer, the offline replacement
+of the Selenium screenshot pipeline in MoonManager.
+
+usage: python -m benchmarks.bench_moon_renderer
+"""
+
+import datetime
+import time
+from typing import List
+
+from utils.moon_renderer import MoonRenderer, albedo_map
+
+DAYS: int = 365
+
+
+def main() -> None:
+    start: datetime.date = datetime.date(2023, 1, 1)
+    days: List[datetime.date] = [
+        start + datetime.timedelta(days=day) for day in range(DAYS)
+    ]
+
+    started: float = time.perf_counter()
+    albedo_map()
+    prepare: float = time.perf_counter() - started
+
+    renderer: MoonRenderer = MoonRenderer()
+    started = time.perf_counter()
+    images: List[bytes] = [renderer.render(day) for day in days]
+    year: float = time.perf_counter() - started
+
+    print(f"albedo map:         {prepare * 1000:8.2f} ms (once per process)")
+    print(f"{DAYS} days:           {year:8.2f} s ({renderer.cache_hits} cache hits)")
+    print(f"per image:          {year / DAYS * 1000:8.2f} ms")
+    print(f"average PNG size:   {sum(map(len, images)) / DAYS / 1024:8.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
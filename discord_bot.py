@@ -1,4 +1,5 @@
 import datetime
+from io import BytesIO
 from typing import Optional, Union
 
 import discord
@@ -9,10 +10,13 @@ from discord.ext import commands
 from logger import get_module_logger, ColoredLogger
 from repos.api_repo import APIRepo
 from repos.db_repo import MoonRepo
+from repos.http_client import HTTPClient
 from repos.models import Coords
+from repos.moon_archive import ArchiveReader
 from settings import Settings
 from use_cases.use_case import DiscordUseCase
-from utils.db_utils import DBConnectionHandler
+from utils.db_utils import init_db, close_db, db_health_check, db_initialized
+from utils.exceptions import DBConnectionError
 from utils.utils import Validator
 
 settings: Settings = Settings()
@@ -22,12 +26,42 @@ intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
-client = discord.Client(intents=intents)
-
-bot = commands.Bot(command_prefix="!", intents=intents)
 logger: ColoredLogger = get_module_logger("DISCORD")
 
 
+class DiscordBot(commands.Bot):
+    """Bot holding repositories, HTTP pool and caches shared by all commands"""
+
+    use_case: DiscordUseCase
+
+    async def setup_hook(self) -> None:
+        """Build shared instances once, before connecting to the gateway"""
+        try:
+            await init_db()
+        except DBConnectionError as err:
+            # other commands work without database
+            logger.error(f"Database is not available, !moon will not work: {err}")
+        else:
+            if not await db_health_check():
+                logger.error("Database is not available, !moon will not work")
+
+        self.use_case = DiscordUseCase(
+            db_repo=MoonRepo(),
+            scrapper_repo=APIRepo(http_client=HTTPClient.shared()),
+        )
+        logger.info("Shared use case ready")
+
+    async def close(self) -> None:
+        if hasattr(self, "use_case"):
+            await self.use_case.close()
+        if db_initialized():  # login may fail before setup_hook
+            await close_db()
+        await super().close()
+
+
+bot = DiscordBot(command_prefix="!", intents=intents)
+
+
 @bot.event
 async def on_ready():
     """Discord startup"""
@@ -64,15 +98,14 @@ async def um_on_wish(ctx: Context, city_name: Optional[str] = None) -> None:
     else:
         city_decoded: str = unidecode(city_name)
         logger.info(f"parsing meteogram for city {city_decoded}")
-        use_case: DiscordUseCase = DiscordUseCase(
-            db_repo=MoonRepo,
-            scrapper_repo=APIRepo,
-        )
+        use_case: DiscordUseCase = ctx.bot.use_case
         coords: Optional[Coords] = await use_case.get_coords(city_name)
-        url_res: Optional[str] = await use_case.icm_database_search(city_name, coords)
+        meteogram: Optional[BytesIO] = await use_case.icm_database_search(
+            city_name, coords
+        )
 
-        if url_res:
-            await ctx.send(file=discord.File(url_res))
+        if meteogram:
+            await ctx.send(file=discord.File(meteogram, filename="meteogram.png"))
         else:
             await ctx.send(
                 f"Wrong city or geolocator not available at this moment. Please try again later"
@@ -87,10 +120,7 @@ async def um_on_wish(ctx: Context, city_name: Optional[str] = None) -> None:
 async def get_moon(ctx: Context, day: Optional[str] = None) -> None:
     """Returns moon information"""
 
-    use_case: DiscordUseCase = DiscordUseCase(
-        db_repo=MoonRepo,
-        scrapper_repo=APIRepo,
-    )
+    use_case: DiscordUseCase = ctx.bot.use_case
 
     if not day:
         await ctx.send("Date is not valid. Should be format like: '20.01.2023'")
@@ -99,23 +129,21 @@ async def get_moon(ctx: Context, day: Optional[str] = None) -> None:
         with Validator(date=day) as res:
             data_validator = res
 
-        async with DBConnectionHandler():
-            if isinstance(data_validator, dict) and data_validator.get("error"):
-                await ctx.send(res.get("error"))
+        if isinstance(data_validator, dict) and data_validator.get("error"):
+            await ctx.send(res.get("error"))
+        else:
+            url_res: Union[str, ArchiveReader, dict] = await use_case.get_moon_img(
+                date_str=day
+            )
+            if isinstance(url_res, dict) and url_res.get("error"):
+                await ctx.send(url_res.get("error"))
             else:
-                url_res: str = await use_case.get_moon_img(date_str=day)
-                if isinstance(url_res, dict) and url_res.get("error"):
-                    await ctx.send(url_res.get("error"))
-                else:
-                    await ctx.send(file=discord.File(url_res))
+                await ctx.send(file=discord.File(url_res, filename="moon.png"))
 
 
 @bot.command(name="sat")
 async def return_sat(ctx):
-    use_case: DiscordUseCase = DiscordUseCase(
-        db_repo=MoonRepo,
-        scrapper_repo=APIRepo,
-    )
+    use_case: DiscordUseCase = ctx.bot.use_case
     url: str = await use_case.get_sat_url()
     await ctx.send(file=discord.File(url))
 
@@ -1,5 +1,4 @@
 import logging
-import os
 from datetime import datetime
 from typing import Optional
 
@@ -63,7 +62,7 @@ class ColoredLogger(logging.Logger):
         console: logging.StreamHandler = logging.StreamHandler()
         console.setFormatter(color_formatter)
 
-        log_dir: str = os.path.join(settings.ROOT_PATH, "logs")
+        log_dir: str = settings.LOGS_PATH
         file_handler: logging = logging.FileHandler(
             f"{log_dir}/{datetime.now().date()}.log"
         )
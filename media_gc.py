@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import os
+from typing import Dict, Set
+
+from logger import ColoredLogger, get_module_logger
+from repos.db_repo import MediaRepo
+from repos.media_store import MediaStore
+from settings import Settings
+from utils.db_utils import DBConnectionHandler
+
+settings: Settings = Settings()
+logger: ColoredLogger = get_module_logger("MEDIA_GC")
+
+
+def run_media_gc_script():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Remove media files which are not referenced by any database row"
+    )
+    parser.add_argument(
+        "-r",
+        "--root",
+        default=os.path.join(settings.MEDIA, "moon"),
+        help="content-addressed store directory",
+    )
+    parser.add_argument(
+        "-n", "--dry-run", action="store_true", help="only report what would be removed"
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    async def main():
+        async with DBConnectionHandler():
+            repo: MediaRepo = MediaRepo()
+            referenced: Set[str] = await repo.referenced()
+            summary: Dict[str, int] = await asyncio.to_thread(
+                MediaStore(args.root).collect_garbage, referenced, args.dry_run
+            )
+            if not args.dry_run:
+                await repo.remove_unreferenced()
+        logger.info(f"Media garbage collection finished: {summary}")
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run_media_gc_script()
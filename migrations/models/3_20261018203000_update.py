@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "geocode" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "city" VARCHAR(255) NOT NULL UNIQUE,
+    "latitude" DOUBLE PRECISION,
+    "longitude" DOUBLE PRECISION,
+    "updated" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "geocode";"""
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DELETE FROM "moon" "duplicate" USING "moon" "kept"
+    WHERE "duplicate"."date"::DATE = "kept"."date"::DATE AND "duplicate"."id" > "kept"."id";
+ALTER TABLE "moon" ALTER COLUMN "date" TYPE DATE USING "date"::DATE;
+CREATE UNIQUE INDEX "uid_moon_date_0f4e4a" ON "moon" ("date");"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX "uid_moon_date_0f4e4a";
+ALTER TABLE "moon" ALTER COLUMN "date" TYPE TIMESTAMPTZ USING "date"::TIMESTAMPTZ;"""
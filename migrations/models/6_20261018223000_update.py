@@ -0,0 +1,13 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "moon" ADD "image_size" INT;
+ALTER TABLE "moon" ADD "image_checksum" VARCHAR(64);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "moon" DROP COLUMN "image_size";
+ALTER TABLE "moon" DROP COLUMN "image_checksum";"""
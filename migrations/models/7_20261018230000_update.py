@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "media" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "checksum" VARCHAR(64) NOT NULL UNIQUE,
+    "path" TEXT NOT NULL,
+    "size" INT NOT NULL,
+    "refcount" INT NOT NULL  DEFAULT 0
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "media";"""
@@ -0,0 +1,18 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "backfill_checkpoint" (
+    "id" SERIAL NOT NULL PRIMARY KEY,
+    "job" VARCHAR(64) NOT NULL UNIQUE,
+    "last_date" DATE,
+    "done" INT NOT NULL  DEFAULT 0,
+    "total" INT NOT NULL  DEFAULT 0,
+    "updated" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "backfill_checkpoint";"""
@@ -1,19 +1,40 @@
+import argparse
 import asyncio
+import datetime as dt
 import os
-import time
+import weakref
 from datetime import datetime
-from typing import Tuple, Optional, Union
+from io import BytesIO
+from typing import (
+    Tuple,
+    Optional,
+    List,
+    Set,
+    AsyncIterator,
+    AsyncIterable,
+    Dict,
+)
 
 from PIL import Image
 from selenium.common import WebDriverException
-from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.wait import WebDriverWait
 
 from logger import ColoredLogger, get_module_logger
 from repos.repo_types import CropParams
 from settings import Settings
-from utils.utils import start_driver, daterange  # type: ignore
+from utils.async_utils import abatch, drain
+from utils.backfill import BackfillProgress
+from utils.browser_pool import BrowserPool
+from utils.utils import daterange, plan_urls  # type: ignore
+from repos.db_repo import MoonRepo
 from repos.models import MoonModel
+from repos.moon_archive import MoonArchive
 from utils.db_utils import DBConnectionHandler
+from utils.executor import ImageExecutor
+from utils.moon_renderer import MoonRenderer
 
 settings: Settings = Settings()
 
@@ -21,113 +42,254 @@ logger: ColoredLogger = get_module_logger("MOON")
 
 
 class MoonManager:
-    def __init__(self, driver: Union[WebDriver], day: bool = False):
+    def __init__(self, pool: Optional[BrowserPool] = None, day: bool = False):
         self.folder_name: str = f"{settings.ROOT_PATH}/moon/"
-        self.driver = driver
+        self.pool: BrowserPool = pool or BrowserPool()
+        self.renderer: MoonRenderer = MoonRenderer()
         # self.base_url: str = "http://www.lowiecki.pl/ao/w/{year}/{month}.htm"
         self.base_url: str = "https://fazyksiezyca24.pl/{year}/{month}/{day}"
+        self.month_url: str = "https://fazyksiezyca24.pl/{year}/{month}"
         self.xpath: str = "/html/body/div[2]/div[2]/div[1]/div[2]/div[2]/button[1]/p"
         self.crop: CropParams = settings.MOON_CROP
-        self.date_range_by_day = daterange(
-            datetime.date(datetime.now()),
-            datetime.date(datetime.strptime(settings.MOON_END_DATE_RANGE, "%d/%m/%Y")),
+        self.start_date: dt.date = datetime.date(datetime.now())
+        self.end_date: dt.date = datetime.date(
+            datetime.strptime(settings.MOON_END_DATE_RANGE, "%d/%m/%Y")
         )
         self.day = day
-        self.db: MoonModel = MoonModel()
+        self.repo: MoonRepo = MoonRepo()
+        self.progress: Optional[BackfillProgress] = None
+        self.archive: MoonArchive = MoonArchive.shared()
+        # drivers which already got cookies button
+        self._consented: weakref.WeakSet = weakref.WeakSet()
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        self.driver.quit()
+        await self.pool.close()
 
-    async def create_new_file_path(self) -> str:
-        """Create new file path with given filename"""
-        name_of_file: str = time.asctime().replace(":", "-")
-        file_name: str = os.path.join(self.folder_name, name_of_file + ".png")
-        return file_name
-
-    async def take_a_screenshot(self) -> str:
-        """Save the file on the hard drive. Returns file path"""
-        screenshot_path: str = await self.create_new_file_path()
-        self.driver.save_screenshot(screenshot_path)
-        return screenshot_path
+    def crop_path(self, year: int, month: int, day: Optional[int] = None) -> str:
+        """Example: {ROOT_PATH}/moon/2023-02-22.png, month crop: .../moon/2023-02.png"""
+        name: str = f"{year}-{month:02d}" + (f"-{day:02d}" if day else "")
+        return os.path.join(self.folder_name, f"{name}.png")
 
     async def crop_file(
-        self, file: Image, year: int, month: int, day: Optional[int] = None
+        self, screenshot: bytes, year: int, month: int, day: Optional[int] = None
     ) -> str:
-        """Crop file and return new path. Example path: {ROOT_PATH}/moon/2023-02-22.png"""
-
-        image_crop = file.crop(
-            (self.crop.left, self.crop.top, self.crop.right, self.crop.bottom)
-        )
-        day2str: Union[int, str] = day
-        if day:
-            day2str = str(day) if len(str(day)) == 2 else f"0{str(day)}"
-
-        month2str: str = str(month) if len(str(month)) == 2 else f"0{str(month)}"
-        file_name: str = os.path.join(
-            self.folder_name, f"{str(year)}-{month2str}-{day2str}.png"
-        )
+        """Crop screenshot, returns new path (see crop_path)"""
 
+        file_name: str = self.crop_path(year, month, day)
         if os.path.exists(file_name):
             return file_name
 
-        image_crop.save(file_name, quality=95)
+        await ImageExecutor.shared().run(
+            self.save_crop, screenshot, self.crop, file_name
+        )
         return file_name
 
+    @staticmethod
+    def save_crop(screenshot: bytes, crop: CropParams, file_name: str) -> None:
+        """Decode PNG screenshot from memory, only the crop is encoded and written"""
+        with Image.open(BytesIO(screenshot)) as file:
+            image_crop: Image = file.crop(
+                (crop.left, crop.top, crop.right, crop.bottom)
+            )
+        image_crop.save(file_name)
+
     async def prepare_moon_photos(self) -> None:
         """Main class method."""
+        if settings.MOON_SOURCE == "render":
+            await self.render_moon_photos()
+            return
         if self.day:
             await self.loop_by_days()
         await self.loop_by_months()
 
-    async def loop_by_months(self):
-        for day in self.date_range_by_day:
-            url: str = self.base_url.format(year=day.year, month=day.month)
-            logger.info(f"Parsing url {url}")
-            file_path, file = self.get_file(url)
-            await self.crop_file(file=file, year=day.year, month=day.month)
-            os.remove(file_path)
+    async def loop_by_months(self) -> int:
+        """Load every month page once. Returns number of page loads avoided"""
+        days: List[dt.date] = list(daterange(self.start_date, self.end_date))
+        pages: Dict[str, dt.date] = {
+            url: day
+            for url, day in plan_urls(days, self.month_url).items()
+            if not os.path.exists(self.crop_path(day.year, day.month))
+        }
+        avoided: int = len(days) - len(pages)
+        logger.info(
+            f"{len(pages)} month pages to load for {len(days)} days, "
+            f"{avoided} page loads avoided"
+        )
+
+        failed: list = await self.pool.run(
+            pages.items(), self.scrape_month, self.save_month
+        )
+        if failed:
+            logger.error(f"Months not scraped: {', '.join(url for url, _ in failed)}")
+        return avoided
+
+    def scrape_month(self, driver: WebDriver, page: Tuple[str, dt.date]) -> bytes:
+        url, _ = page
+        logger.info(f"Parsing url {url}")
+        return self.get_file(driver, url)
+
+    async def save_month(self, page: Tuple[str, dt.date], screenshot: bytes) -> None:
+        _, day = page
+        await self.crop_file(screenshot, year=day.year, month=day.month)
+
+    async def plan_days(self, job: str) -> List[dt.date]:
+        """Days in range without image. Stored days are loaded with one query"""
+        stored: Set[dt.date] = await self.repo.stored_dates(
+            self.start_date, self.end_date
+        )
+        days: List[dt.date] = [
+            day
+            for day in daterange(self.start_date, self.end_date)
+            if day not in stored
+        ]
+        logger.info(f"{len(stored)} days already stored, {len(days)} to do")
+
+        self.progress = BackfillProgress(job, total=len(days))
+        await self.progress.start()
+        return days
 
     async def loop_by_days(self) -> None:
+        records: asyncio.Queue = asyncio.Queue()
+
+        async def save_day(day: dt.date, screenshot: bytes) -> None:
+            await records.put((day, await self.crop_day(day, screenshot)))
+
         async with DBConnectionHandler():
-            for day in self.date_range_by_day:
-                url: str = self.base_url.format(
-                    year=day.year, month=day.month, day=day.day
-                )
-                logger.info(f"Parsing url {url}")
-                file_path, file = await self.get_file(url)
-                crop_file_path: str = await self.crop_file(
-                    file=file, year=day.year, month=day.month, day=day.day
-                )
-                await self.db.create(
-                    date=day.strftime("%Y-%m-%d"), image=crop_file_path
-                )
-                logger.info("Saved pic to DB")
-                os.remove(file_path)
+            days: List[dt.date] = await self.plan_days("moon_days")
+            storing: asyncio.Task = asyncio.create_task(self.store_days(drain(records)))
+            try:
+                failed: list = await self.pool.run(days, self.scrape_day, save_day)
+            finally:
+                await records.put(None)
+                await storing
+        if failed:
+            logger.error(f"Days not scraped: {', '.join(map(str, failed))}")
 
-    async def get_file(self, url) -> Tuple[str, Image.Image]:
-        self.driver.get(url)
-        time.sleep(0.5)
+    def scrape_day(self, driver: WebDriver, day: dt.date) -> bytes:
+        url: str = self.base_url.format(year=day.year, month=day.month, day=day.day)
+        logger.info(f"Parsing url {url}")
+        return self.get_file(driver, url)
+
+    async def crop_day(self, day: dt.date, screenshot: bytes) -> str:
+        return await self.crop_file(
+            screenshot, year=day.year, month=day.month, day=day.day
+        )
 
+    async def store_days(self, records: AsyncIterable) -> None:
+        """Save (day, image path) records to database in batches and archive them"""
+        async for batch in abatch(records, settings.DB_BULK_BATCH_SIZE):
+            await self.repo.bulk_upsert(batch)
+            await asyncio.to_thread(
+                lambda: [self.archive.append_file(*record) for record in batch]
+            )
+            if self.progress is not None:
+                await self.progress.advance(max(day for day, _ in batch), len(batch))
+
+    async def render_moon_photos(self) -> None:
+        """Render moon images locally instead of scraping them"""
+        os.makedirs(self.folder_name, exist_ok=True)
+        async with DBConnectionHandler():
+            days: List[dt.date] = await self.plan_days("moon_render")
+            await self.store_days(self.render_days(days))
+        logger.info(f"Rendered moon images, {self.renderer.cache_hits} from cache")
+
+    async def render_days(
+        self, days: List[dt.date]
+    ) -> AsyncIterator[Tuple[dt.date, str]]:
+        """Render days on image executor workers. Yields (day, image path)"""
+        executor: ImageExecutor = ImageExecutor.shared()
+        for start in range(0, len(days), executor.workers):
+            chunk: List[dt.date] = days[start : start + executor.workers]
+            contents: List[bytes] = await asyncio.gather(
+                *(executor.run(self.renderer.render, day) for day in chunk)
+            )
+            for day, content in zip(chunk, contents):
+                file_path: str = os.path.join(
+                    self.folder_name, f"{day.isoformat()}.png"
+                )
+                await asyncio.to_thread(self.write_file, file_path, content)
+                yield day, file_path
+
+    @staticmethod
+    def write_file(file_path: str, content: bytes) -> None:
+        """
+        Write under temporary name and rename. Existing file may be hard linked into
+        media store, so it is replaced, never rewritten in place.
+        """
+        tmp_path: str = f"{file_path}.{os.getpid()}.tmp"
         try:
-            self.driver.find_element("xpath", self.xpath).click()
-        except WebDriverException:
-            pass  # Do not raise exception
+            with open(tmp_path, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def build_archive(self) -> int:
+        """Pack moon images from database which are not archived yet. Returns number"""
+        added: int = 0
+        async with DBConnectionHandler():
+            for moon in await MoonModel.all():
+                if moon.date in self.archive:
+                    continue
+                try:
+                    await asyncio.to_thread(
+                        self.archive.append_file, moon.date, moon.image.url
+                    )
+                except FileNotFoundError:
+                    logger.warning(f"Moon image for {moon.date} is missing, skipped")
+                    continue
+                added += 1
+        logger.info(f"{added} moon images added to archive")
+        return added
+
+    def get_file(self, driver: WebDriver, url: str) -> bytes:
+        """Load page in driver, returns PNG screenshot. Blocking, runs in pool thread"""
+        driver.get(url)
+        wait: WebDriverWait = WebDriverWait(driver, settings.BROWSER_WAIT_TIMEOUT)
+        wait.until(
+            lambda loaded: loaded.execute_script("return document.readyState")
+            == "complete"
+        )
+
+        if driver not in self._consented:
+            # cookies button is shown once per browser, do not wait for it again
+            self._consented.add(driver)
+            try:
+                button = expected_conditions.element_to_be_clickable(
+                    (By.XPATH, self.xpath)
+                )
+                wait.until(button).click()
+            except WebDriverException:
+                pass  # Do not raise exception
 
-        file_name: str = await self.take_a_screenshot()
-        file: Image = Image.open(file_name)
-        return file_name, file
+        return driver.get_screenshot_as_png()
 
 
 def run_moon_script():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Prepare moon phase images"
+    )
+    parser.add_argument(
+        "-a",
+        "--build-archive",
+        action="store_true",
+        help="only pack moon images saved in database into the archive",
+    )
+    args: argparse.Namespace = parser.parse_args()
+
     async def main():
-        async with MoonManager(driver=start_driver(), day=True) as moon:
-            await moon.prepare_moon_photos()
+        async with MoonManager(day=True) as moon:
+            if args.build_archive:
+                await moon.build_archive()
+            else:
+                await moon.prepare_moon_photos()
 
-    loop = asyncio.get_event_loop()
-    loop.run_until_complete(main())
+    asyncio.run(main())
 
 
-run_moon_script()
+if __name__ == "__main__":
+    run_moon_script()
@@ -1,113 +1,180 @@
+import asyncio
 import os.path
 from datetime import datetime as dt
 import json
-import re
-import uuid
-from typing import Optional, List, Tuple
-from urllib import request
+from typing import Optional, Tuple
 
-import bs4
-import requests
 from geopy import Nominatim, Location
-from geopy.exc import GeocoderUnavailable
-from requests import Response
+from geopy.adapters import AioHTTPAdapter
+from geopy.exc import GeocoderServiceError
 
 from logger import ColoredLogger, get_module_logger
+from repos.cache_repo import GeocodeCache, GridPointCache
 from repos.consts import HEADERS
+from repos.http_client import HTTPClient, HTTPResponse
 from repos.models import Coords
-from repos.repo_types import Coords2Points
+from repos.parsers import parse_mgram_id, parse_grid_points
+from repos.repo_types import Coords2Points, CacheEntry
 from settings import Settings
-from utils.utils import URLConfig
+from utils.async_utils import AsyncRateLimiter, SingleFlight
+from utils.utils import URLConfig, um_model_run, normalize_city
 
 logger: ColoredLogger = get_module_logger("APIRepo")
 settings: Settings = Settings()
 
+# Nominatim usage policy: max 1 request per second for the whole application
+geocode_limiter: AsyncRateLimiter = AsyncRateLimiter(rate=settings.GEOCODE_RATE_LIMIT)
+
 
 class APIRepo:
     """Base repo responsible for handling requests"""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        http_client: Optional[HTTPClient] = None,
+        geocode_cache: Optional[GeocodeCache] = None,
+        grid_point_cache: Optional[GridPointCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+    ) -> None:
         self.urls: URLConfig = URLConfig()
-        self.session: requests.Session = requests.Session()
+        self.http: HTTPClient = http_client or HTTPClient.shared()
+        self.geocode_cache: GeocodeCache = geocode_cache or GeocodeCache.shared()
+        self.grid_point_cache: GridPointCache = (
+            grid_point_cache or GridPointCache.shared()
+        )
+        self.single_flight: SingleFlight = single_flight or SingleFlight.shared()
         self.headers: dict = HEADERS
-
-    async def __fetch_data_post(self, url: str, **kwargs) -> Response:
-        self.session.headers.update(self.headers)
+        self._geolocator: Optional[Nominatim] = None
+
+    @property
+    def geolocator(self) -> Nominatim:
+        """Nominatim client created on first use. Its session is kept until close()"""
+        if self._geolocator is None:
+            self._geolocator = Nominatim(
+                user_agent="lukas", adapter_factory=AioHTTPAdapter
+            )
+        return self._geolocator
+
+    async def close(self) -> None:
+        if self._geolocator is not None:
+            await self._geolocator.__aexit__(None, None, None)
+            self._geolocator = None
+        await self.http.close()
+
+    async def __fetch_data_post(self, url: str, **kwargs) -> HTTPResponse:
+        kwargs.setdefault("headers", self.headers)
         logger.info(f"Started parsing {url}")
-        response: Response = self.session.post(url=url, **kwargs)
-        response.raise_for_status()
+        response: HTTPResponse = await self.http.post(url, **kwargs)
         logger.info("Success")
         return response
 
-    async def __fetch_data_get(self, url: str, headers: bool = True) -> Response:
-
-        if headers:
-            self.session.headers.update(self.headers)
+    async def __fetch_data_get(self, url: str, headers: bool = True) -> HTTPResponse:
         logger.info(f"Started parsing {url}")
-        response: Response = self.session.get(url=url)
-        response.raise_for_status()
+        response: HTTPResponse = await self.http.get(
+            url, headers=self.headers if headers else None
+        )
         logger.info("Success")
         return response
 
-    @staticmethod
-    async def get_coords(city: str) -> Optional[Coords]:
-        geolocator: Nominatim = Nominatim(user_agent="lukas")
-        try:
-            location: Location = geolocator.geocode(city)
-        except GeocoderUnavailable:
-            location: None = None
+    async def __download(self, url: str, file_path: str) -> str:
+        """Download file without blocking event loop. Returns file path"""
+        response: HTTPResponse = await self.__fetch_data_get(url, headers=False)
+        await asyncio.to_thread(self.save_file, file_path, response.content)
+        return file_path
 
-        if not location:
-            return None
+    async def get_image(self, url: str) -> bytes:
+        """Download image into memory"""
+        response: HTTPResponse = await self.__fetch_data_get(url, headers=False)
+        return response.content
 
-        return Coords(latitude=location.latitude, longitude=location.longitude)
+    @staticmethod
+    def save_file(file_path: str, content: bytes) -> None:
+        with open(file_path, "wb") as f:
+            f.write(content)
 
-    async def get_icm_result(self, **kwargs) -> Optional[str]:
-        response: Response = await self.__fetch_data_post(
-            self.urls.UM_URL, headers=self.headers, **kwargs
+    async def get_coords(self, city: str) -> Optional[Coords]:
+        return await self.single_flight.do(
+            "get_coords", normalize_city(city), self._get_coords, city
         )
-        parse_response: bs4.BeautifulSoup = bs4.BeautifulSoup(response.text, "lxml")
 
-        if "NIE ZNALEZIONO" in parse_response.text:
+    async def _get_coords(self, city: str) -> Optional[Coords]:
+        cached: Optional[CacheEntry] = await self.geocode_cache.get(city)
+        if cached:
+            return cached.value
+
+        try:
+            location: Optional[Location] = await self.geocode(city)
+        except GeocoderServiceError as error:
+            # unavailable, timed out, rate limited... do not cache, may be back soon
+            logger.warning(f"Geocoding {city} failed: {error!r}")
             return None
-        hrefs: list = list(parse_response.find_all(href=True))
-        id_result: list = [
-            re.findall("[0-9]+", str(element))  # noqa
-            for element in hrefs
-            if "show_mgram" in str(element)
-        ][0]
-
-        url: str = self.urls.METEOGRAM_URL.format(id=str(id_result[0]))
-        get_req: Response = await self.__fetch_data_get(url)
-
-        get_soup: bs4.BeautifulSoup = bs4.BeautifulSoup(get_req.text, "lxml")
-        get_scripts: list = get_soup.find_all(language=True)
-        scripts: List[str] = str(get_scripts).split(";")
-        var_act_x: list = [
-            re.findall("[0-9]+", act_x)
-            for act_x in scripts
-            if "var act_x" in act_x  # noqa
-        ]
-        var_act_y: list = [
-            re.findall("[0-9]+", act_y)
-            for act_y in scripts
-            if "var act_y" in act_y  # noqa
-        ]
-        coords2points: Coords2Points = Coords2Points(
-            act_x=int(var_act_x[0][0]), act_y=int(var_act_y[0][0])
+
+        coords: Optional[Coords] = None
+        if location:
+            coords = Coords(latitude=location.latitude, longitude=location.longitude)
+
+        await self.geocode_cache.set(city, coords)
+        return coords
+
+    async def geocode(self, city: str) -> Optional[Location]:
+        """Nominatim geocode, rate limited for whole application"""
+        async with geocode_limiter:
+            return await self.geolocator.geocode(city)
+
+    async def get_grid_points(self, city: str) -> Optional[Coords2Points]:
+        """
+        Grid points for city. Served from grid point store when city was searched before,
+        otherwise scraped from ICM and saved (also when city is not found).
+        """
+        cached: Optional[CacheEntry] = await self.grid_point_cache.get(city)
+        if cached:
+            logger.info(f"Grid points for city {city} found in store: {cached.value}")
+            return cached.value
+
+        coords2points: Optional[Coords2Points] = await self.scrape_grid_points(
+            data={"name": city}
         )
+        await self.grid_point_cache.set(city, coords2points)
+        return coords2points
+
+    async def get_icm_result(self, **kwargs) -> Optional[str]:
+        coords2points: Optional[Coords2Points] = await self.scrape_grid_points(**kwargs)
 
         if coords2points:
             return self.prepare_metagram_url(coords2points=coords2points)
 
-    def prepare_metagram_url(self, coords2points: Coords2Points) -> str:
+    async def scrape_grid_points(self, **kwargs) -> Optional[Coords2Points]:
+        """Search city on ICM page and read its grid points from meteogram page"""
+        key: str = json.dumps(kwargs, sort_keys=True, default=str)
+        return await self.single_flight.do(
+            "scrape_grid_points", key, self._scrape_grid_points, **kwargs
+        )
+
+    async def _scrape_grid_points(self, **kwargs) -> Optional[Coords2Points]:
+        response: HTTPResponse = await self.__fetch_data_post(
+            self.urls.UM_URL, headers=self.headers, **kwargs
+        )
+        mgram_id: Optional[int] = parse_mgram_id(response.content)
+        if mgram_id is None:
+            return None
+
+        url: str = self.urls.METEOGRAM_URL.format(id=mgram_id)
+        get_req: HTTPResponse = await self.__fetch_data_get(url)
+        return parse_grid_points(get_req.content)
+
+    def prepare_metagram_url(
+        self, coords2points: Coords2Points, model_run: Optional[str] = None
+    ) -> str:
+        """Meteogram url. Model run works as cache buster, url is stable until the next run"""
         return self.urls.MGRAM_URL.format(
-            act_y=coords2points.act_y, act_x=coords2points.act_x, uuid=str(uuid.uuid1())
+            act_y=coords2points.act_y,
+            act_x=coords2points.act_x,
+            model_run=model_run or um_model_run(),
         )
 
     async def get_sunrise_time(self) -> Tuple[dt, dt]:
         coords: Coords = await self.get_coords("Warszawa")
-        res: Response = await self.__fetch_data_get(
+        res: HTTPResponse = await self.__fetch_data_get(
             self.urls.API_SUNRISE_URL.format(
                 lat=coords.latitude, long=coords.longitude
             ),
@@ -126,13 +193,19 @@ class APIRepo:
 
     async def get_sat_img(self) -> str:
         file_path: str = os.path.join(settings.MEDIA, "sat.gif")
-        request.urlretrieve(self.urls.SAT, file_path)
-        return file_path
+        return await self.single_flight.do(
+            "get_sat_img", file_path, self.__download, self.urls.SAT, file_path
+        )
 
     async def get_sat_infra_img(self) -> str:
         file_path: str = os.path.join(settings.MEDIA, "infra_sat.gif")
-        request.urlretrieve(self.urls.SAT_INFRA, file_path)
-        return file_path
+        return await self.single_flight.do(
+            "get_sat_infra_img",
+            file_path,
+            self.__download,
+            self.urls.SAT_INFRA,
+            file_path,
+        )
 
 # import asyncio
 # from functools import wraps
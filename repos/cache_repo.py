@@ -0,0 +1,278 @@
+import math
+import os
+from abc import ABC, abstractmethod
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional, Hashable, Any, Union, List, Tuple
+
+from tortoise.models import Model
+
+from logger import ColoredLogger, get_module_logger
+from repos.db_repo import GeocodeRepo, GridPointRepo
+from repos.models import Coords, GeocodeModel, GridPointModel
+from repos.repo_types import CacheEntry, Coords2Points
+from settings import Settings
+from utils.db_utils import db_initialized, DB_ERRORS
+from utils.utils import normalize_city
+
+logger: ColoredLogger = get_module_logger("CACHE")
+settings: Settings = Settings()
+
+CityRepo = Union[GeocodeRepo, GridPointRepo]
+
+# meteograms being written, skipped by eviction
+TMP_SUFFIX: str = ".tmp"
+
+
+class LRUCache:
+    """In-process LRU with per entry expiration time"""
+
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        entry: Optional[CacheEntry] = self._data.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value, expires: float) -> CacheEntry:
+        entry: CacheEntry = CacheEntry(value=value, expires=expires)
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.size:
+            self._data.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CityCache(ABC):
+    """
+    Two-tier cache keyed by normalized city name: in-process LRU backed by database table.
+    "Not found" results are cached too, with their own TTL (value of entry is None).
+    Subclasses map values to table rows.
+    """
+
+    _shared: Optional["CityCache"] = None
+
+    def __init__(
+        self, size: int, ttl: float, negative_ttl: float, db_repo: CityRepo
+    ) -> None:
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self.memory: LRUCache = LRUCache(size)
+        self.db: CityRepo = db_repo
+
+    @classmethod
+    def shared(cls):
+        """Process-wide cache used by repos created without their own cache"""
+
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @abstractmethod
+    def _from_row(self, row: Model) -> Any:
+        """Cached value of table row"""
+
+    @abstractmethod
+    def _to_row(self, value: Any) -> dict:
+        """Table row fields of cached value"""
+
+    def _expires(self, value: Any, updated: float) -> float:
+        return updated + (self.ttl if value is not None else self.negative_ttl)
+
+    async def get(self, city: str) -> Optional[CacheEntry]:
+        """Cached entry for city. None when city is not cached or entry expired"""
+
+        key: str = normalize_city(city)
+        entry: Optional[CacheEntry] = self.memory.get(key)
+        if entry or not db_initialized():
+            return entry
+
+        try:
+            row: Optional[Model] = await self.db.get(key)
+        except DB_ERRORS as err:
+            logger.warning(f"{self.__class__.__name__} database not available: {err}")
+            return None
+
+        if not row:
+            return None
+
+        value: Any = self._from_row(row)
+        expires: float = self._expires(value, row.updated.timestamp())
+        if expires <= time.time():
+            return None
+        return self.memory.set(key, value, expires)
+
+    async def set(self, city: str, value: Any) -> CacheEntry:
+        """Save result for city. value=None means city not found"""
+
+        key: str = normalize_city(city)
+        entry: CacheEntry = self.memory.set(
+            key, value, self._expires(value, time.time())
+        )
+        if not db_initialized():
+            return entry
+
+        try:
+            await self.db.upsert(key, **self._to_row(value))
+        except DB_ERRORS as err:
+            logger.warning(f"{self.__class__.__name__} database not available: {err}")
+        return entry
+
+
+class GeocodeCache(CityCache):
+    """City name -> Coords. Backed by geocode table"""
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        db_repo: Optional[GeocodeRepo] = None,
+    ) -> None:
+        super().__init__(
+            size=size or settings.GEOCODE_CACHE_SIZE,
+            ttl=ttl or settings.GEOCODE_CACHE_TTL,
+            negative_ttl=negative_ttl or settings.GEOCODE_NEGATIVE_TTL,
+            db_repo=db_repo or GeocodeRepo(),
+        )
+
+    def _from_row(self, row: GeocodeModel) -> Optional[Coords]:
+        if row.latitude is None or row.longitude is None:
+            return None
+        return Coords(latitude=row.latitude, longitude=row.longitude)
+
+    def _to_row(self, value: Optional[Coords]) -> dict:
+        return {
+            "latitude": value.latitude if value else None,
+            "longitude": value.longitude if value else None,
+        }
+
+
+class GridPointCache(CityCache):
+    """
+    City name -> meteo grid point (Coords2Points) found by ICM search.
+    Backed by grid_point table. Points never change, so they are kept forever by default.
+    "Not found" results expire: the key is normalized, ICM search is not.
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        db_repo: Optional[GridPointRepo] = None,
+    ) -> None:
+        super().__init__(
+            size=size or settings.GRID_POINT_CACHE_SIZE,
+            ttl=ttl or settings.GRID_POINT_CACHE_TTL or math.inf,
+            negative_ttl=negative_ttl or settings.GRID_POINT_NEGATIVE_TTL,
+            db_repo=db_repo or GridPointRepo(),
+        )
+
+    def _from_row(self, row: GridPointModel) -> Optional[Coords2Points]:
+        if row.act_x is None or row.act_y is None:
+            return None
+        return Coords2Points(act_x=row.act_x, act_y=row.act_y)
+
+    def _to_row(self, value: Optional[Coords2Points]) -> dict:
+        return {
+            "act_x": value.act_x if value else None,
+            "act_y": value.act_y if value else None,
+        }
+
+
+class MeteogramCache:
+    """
+    Merged UM meteograms on disk, keyed by (grid point, model run):
+    {folder}/{model_run}/{act_x}_{act_y}.png
+    Storing a newer model run evicts older runs. Total size is bounded,
+    least recently used files are removed first.
+    """
+
+    _shared: Optional["MeteogramCache"] = None
+
+    def __init__(
+        self, folder: Optional[str] = None, max_bytes: Optional[int] = None
+    ) -> None:
+        self.folder: str = folder or os.path.join(settings.MEDIA, "meteograms")
+        self.max_bytes: int = max_bytes or settings.METEOGRAM_CACHE_MAX_BYTES
+
+    @classmethod
+    def shared(cls) -> "MeteogramCache":
+        """Process-wide cache used by use cases created without their own cache"""
+
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def path(self, coords2points: Coords2Points, model_run: str) -> str:
+        return os.path.join(
+            self.folder, model_run, f"{coords2points.act_x}_{coords2points.act_y}.png"
+        )
+
+    def get(self, coords2points: Coords2Points, model_run: str) -> Optional[bytes]:
+        """Cached meteogram. None if grid point is not cached for model run"""
+
+        path: str = self.path(coords2points, model_run)
+        try:
+            with open(path, "rb") as f:
+                content: bytes = f.read()
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, coords2points: Coords2Points, model_run: str, content: bytes) -> str:
+        """Store merged meteogram. Returns cached file path"""
+
+        path: str = self.path(coords2points, model_run)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write under unique name first, concurrent commands never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=TMP_SUFFIX)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        self.evict(model_run)
+        return path
+
+    def evict(self, model_run: str) -> None:
+        """Remove model runs older than given one and keep cache size under max_bytes"""
+
+        files: List[Tuple[float, int, str]] = []
+        for run in os.listdir(self.folder):
+            run_folder: str = os.path.join(self.folder, run)
+            if run < model_run:
+                logger.info(f"Evicting meteograms of model run {run}")
+                shutil.rmtree(run_folder, ignore_errors=True)
+                continue
+            with os.scandir(run_folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith(TMP_SUFFIX):
+                        continue
+                    stat: os.stat_result = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total: int = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
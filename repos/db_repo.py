@@ -1,25 +1,68 @@
-from typing import List
+import asyncio
+import datetime
+from collections import Counter
+from collections.abc import AsyncIterable
+from typing import List, Optional, Set, Iterable, Tuple, Union, Dict
+
+from tortoise import BaseDBAsyncClient
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
 
 from logger import ColoredLogger, get_module_logger
-from repos.models import MoonModel
+from repos.models import (
+    MoonModel,
+    GeocodeModel,
+    GridPointModel,
+    MediaModel,
+    BackfillCheckpointModel,
+)
+from repos.repo_types import StoredFile
+from repos.schemas import ImageProxy
+from settings import Settings
+from utils.async_utils import abatch
+
+settings: Settings = Settings()
 
 logger: ColoredLogger = get_module_logger("MOON")
 
+MoonRecord = Tuple[datetime.date, str]  # (date, image path)
+
 
 class MoonRepo:
     """Moon table repo. Handles basic CRUD operation"""
 
     model = MoonModel
 
+    def __init__(self) -> None:
+        self.media: MediaRepo = MediaRepo()
+
     async def filter(self, **kwargs) -> List[MoonModel]:
         """Filter by given params."""
         res = await self.model.filter(**kwargs)
 
         return res
 
+    async def get_by_date(self, date: datetime.date) -> Optional[ImageProxy]:
+        """Moon image for exact date. Single unique index lookup, only image column fetched"""
+        return (
+            await self.model.filter(date=date).first().values_list("image", flat=True)
+        )
+
+    async def stored_dates(
+        self, start: datetime.date, end: datetime.date
+    ) -> Set[datetime.date]:
+        """Dates from start to end (inclusive) which already have image, one query"""
+        return set(
+            await self.model.filter(date__gte=start, date__lte=end).values_list(
+                "date", flat=True
+            )
+        )
+
     async def create(self, **kwargs) -> MoonModel:
         """Save MoonModel instance to database"""
-        res: MoonModel = await self.model.create(**kwargs)  # noqa
+        async with in_transaction():
+            res: MoonModel = await self.model.create(**kwargs)  # noqa
+            await self.media.incref(res.image_checksum, res.image.url, res.image_size)
         logger.info(f"Object with id {res.pk} created")
 
         return res
@@ -27,11 +70,190 @@ class MoonRepo:
     async def save(self, **kwargs) -> MoonModel:
         """Save MoonModel instance to database"""
         model: MoonModel = self.model(**kwargs)
-        res: MoonModel = await model.save()  # noqa
-        logger.info(f"Object with id {res.pk} created")
+        async with in_transaction():
+            await model.save()
+            await self.media.incref(
+                model.image_checksum, model.image.url, model.image_size
+            )
+        logger.info(f"Object with id {model.pk} created")
 
-        return res
+        return model
+
+    async def bulk_upsert(
+        self,
+        records: Union[Iterable[MoonRecord], AsyncIterable],
+        batch_size: Optional[int] = None,
+    ) -> int:
+        """
+        Save (date, image path) records from iterable or async stream, image of
+        already stored date is replaced. Every batch is one transaction with
+        INSERT ... ON CONFLICT (date) DO UPDATE, so it costs a few round-trips
+        whatever its size. Returns number of saved records.
+        """
+        saved: int = 0
+        async for batch in abatch(records, batch_size or settings.DB_BULK_BATCH_SIZE):
+            saved += await self._upsert_batch(batch)
+        return saved
+
+    async def _upsert_batch(self, records: List[MoonRecord]) -> int:
+        images: Dict[datetime.date, str] = dict(records)  # last image of a date wins
+        models: List[MoonModel] = [
+            self.model(date=date, image=image) for date, image in images.items()
+        ]
+        await asyncio.to_thread(lambda: [model.store_files() for model in models])
+
+        async with in_transaction() as connection:
+            replaced: List[Optional[str]] = await self.model.filter(
+                date__in=list(images)
+            ).values_list("image_checksum", flat=True)
+            await self.model.bulk_create(
+                models,
+                on_conflict=["date"],
+                update_fields=["image", "image_size", "image_checksum"],
+            )
+            await self.media.change_refs(
+                [
+                    StoredFile(model.image.url, model.image_size, model.image_checksum)
+                    for model in models
+                ],
+                replaced,
+                connection,
+            )
+        logger.info(f"{len(models)} moon images upserted")
+        return len(models)
+
+    async def delete(self, date: datetime.date) -> bool:
+        """Delete moon image for date. Image file is released for garbage collection"""
+        async with in_transaction():
+            moon: Optional[MoonModel] = await self.model.get_or_none(date=date)
+            if moon is None:
+                return False
+            await moon.delete()
+            await self.media.decref(moon.image_checksum)
+        return True
 
     async def all(self) -> List[MoonModel]:
         """Get all MoonModel instances from DB"""
         return await self.model.all()
+
+
+class GeocodeRepo:
+    """Geocode table repo. Keeps coords found for normalized city names"""
+
+    model = GeocodeModel
+
+    async def get(self, city: str) -> Optional[GeocodeModel]:
+        """Get cached coords for city. None if city was never geocoded"""
+        return await self.model.get_or_none(city=city)
+
+    async def upsert(
+        self, city: str, latitude: Optional[float], longitude: Optional[float]
+    ) -> GeocodeModel:
+        """Save coords for city. Empty coords mean city not found"""
+        res: GeocodeModel
+        res, _ = await self.model.update_or_create(
+            city=city, defaults={"latitude": latitude, "longitude": longitude}
+        )
+        return res
+
+
+class GridPointRepo:
+    """Grid point table repo. Keeps meteo grid points found by ICM search for city names"""
+
+    model = GridPointModel
+
+    async def get(self, city: str) -> Optional[GridPointModel]:
+        """Get grid point for city. None if city was never searched"""
+        return await self.model.get_or_none(city=city)
+
+    async def upsert(
+        self, city: str, act_x: Optional[int], act_y: Optional[int]
+    ) -> GridPointModel:
+        """Save grid point for city. Empty points mean city not found"""
+        res: GridPointModel
+        res, _ = await self.model.update_or_create(
+            city=city, defaults={"act_x": act_x, "act_y": act_y}
+        )
+        return res
+
+
+class MediaRepo:
+    """Reference counts of content-addressed media files"""
+
+    model = MediaModel
+
+    async def incref(self, checksum: Optional[str], path: str, size: int) -> None:
+        """Count new reference to file. Files stored before checksums existed are skipped"""
+        if not checksum:
+            return
+        await self.model.get_or_create(
+            checksum=checksum, defaults={"path": path, "size": size}
+        )
+        await self.model.filter(checksum=checksum).update(refcount=F("refcount") + 1)
+
+    async def decref(self, checksum: Optional[str]) -> None:
+        if checksum:
+            await self.model.filter(checksum=checksum).update(
+                refcount=F("refcount") - 1
+            )
+
+    async def change_refs(
+        self,
+        added: List[StoredFile],
+        released: Iterable[Optional[str]],
+        connection: BaseDBAsyncClient,
+    ) -> None:
+        """
+        Count references to many files at once: missing counters are inserted in
+        one batch and all counters are changed with one UPDATE
+        """
+        counts: Counter = Counter(file.checksum for file in added if file.checksum)
+        counts.subtract(checksum for checksum in released if checksum)
+        counts = Counter({checksum: n for checksum, n in counts.items() if n})
+        if not counts:
+            return
+
+        new_files: Dict[str, StoredFile] = {
+            file.checksum: file for file in added if counts[file.checksum] > 0
+        }
+        await self.model.bulk_create(
+            [
+                self.model(checksum=file.checksum, path=file.path, size=file.size)
+                for file in new_files.values()
+            ],
+            ignore_conflicts=True,
+        )
+        await connection.execute_query(
+            'UPDATE "media" SET "refcount" = "media"."refcount" + "delta"."count" '
+            'FROM unnest($1::varchar[], $2::int[]) AS "delta"("checksum", "count") '
+            'WHERE "media"."checksum" = "delta"."checksum"',
+            [list(counts), list(counts.values())],
+        )
+
+    async def referenced(self) -> Set[str]:
+        """Checksums of files still used by some row"""
+        return set(
+            await self.model.filter(refcount__gt=0).values_list("checksum", flat=True)
+        )
+
+    async def remove_unreferenced(self) -> int:
+        """Delete counters of files nobody uses. Returns number of deleted rows"""
+        return await self.model.filter(refcount__lte=0).delete()
+
+
+class CheckpointRepo:
+    """Progress of long running jobs, so they can be resumed"""
+
+    model = BackfillCheckpointModel
+
+    async def get(self, job: str) -> Optional[BackfillCheckpointModel]:
+        return await self.model.get_or_none(job=job)
+
+    async def save(
+        self, job: str, last_date: datetime.date, done: int, total: int
+    ) -> BackfillCheckpointModel:
+        res: BackfillCheckpointModel
+        res, _ = await self.model.update_or_create(
+            job=job, defaults={"last_date": last_date, "done": done, "total": total}
+        )
+        return res
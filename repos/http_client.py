@@ -0,0 +1,137 @@
+import asyncio
+import json
+from asyncio import AbstractEventLoop
+from typing import Optional, Any
+
+import aiohttp
+
+from logger import ColoredLogger, get_module_logger
+from settings import Settings
+
+logger: ColoredLogger = get_module_logger("HTTP")
+settings: Settings = Settings()
+
+# headers computed by the client for every request
+SKIPPED_HEADERS: tuple = ("Content-Length", "Host")
+
+
+class HTTPResponse:
+    """Already read HTTP response. Connection is back in the pool when it is created"""
+
+    def __init__(self, status: int, url: str, content: bytes, encoding: str) -> None:
+        self.status: int = status
+        self.url: str = url
+        self.content: bytes = content
+        self.encoding: str = encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+class HTTPClient:
+    """
+    Asynchronous HTTP client with keep-alive connection pool.
+    Session is created on first request in the running event loop, session of
+    a finished loop is closed. Client cannot be shared by two running loops.
+    """
+
+    _shared: Optional["HTTPClient"] = None
+
+    def __init__(
+        self,
+        limit: Optional[int] = None,
+        limit_per_host: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+    ) -> None:
+        self.limit: int = limit or settings.HTTP_POOL_SIZE
+        self.limit_per_host: int = limit_per_host or settings.HTTP_LIMIT_PER_HOST
+        self.timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+            total=None,
+            connect=connect_timeout or settings.HTTP_CONNECT_TIMEOUT,
+            sock_read=read_timeout or settings.HTTP_READ_TIMEOUT,
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[AbstractEventLoop] = None
+
+    @classmethod
+    def shared(cls) -> "HTTPClient":
+        """Process-wide client used by repos created without their own client"""
+
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def _drop_session(self) -> None:
+        """
+        Close session of a finished event loop. Its connections are closed without
+        the old loop (it cannot run anymore), session is detached from them.
+        """
+
+        if self._loop is not None and self._loop.is_running():
+            raise RuntimeError("HTTPClient is already used by another event loop")
+
+        session, self._session = self._session, None
+        if session is None or session.closed:
+            return
+
+        connector: Optional[aiohttp.BaseConnector] = session.connector
+        session.detach()
+        if connector is not None:
+            # transports are closed right away, returned awaitable only finishes it
+            asyncio.ensure_future(connector.close())
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        loop: AbstractEventLoop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            self._drop_session()
+        if self._session is None or self._session.closed:
+            connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, raise_for_status=True
+            )
+            self._loop = loop
+        return self._session
+
+    @staticmethod
+    def _prepare_headers(headers: Optional[dict]) -> Optional[dict]:
+        if not headers:
+            return None
+        return {
+            key: value for key, value in headers.items() if key not in SKIPPED_HEADERS
+        }
+
+    async def request(
+        self, method: str, url: str, headers: Optional[dict] = None, **kwargs
+    ) -> HTTPResponse:
+        async with self.session.request(
+            method, url, headers=self._prepare_headers(headers), **kwargs
+        ) as response:
+            content: bytes = await response.read()
+            return HTTPResponse(
+                status=response.status,
+                url=str(response.url),
+                content=content,
+                encoding=response.charset or "utf-8",
+            )
+
+    async def get(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> HTTPResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from typing import Iterator, Set, Dict, Callable
+
+from logger import ColoredLogger, get_module_logger
+from repos.repo_types import StoredFile
+from utils.exceptions import NoImageFoundException
+
+logger: ColoredLogger = get_module_logger("MEDIA")
+
+CHECKSUM_LENGTH: int = 64  # sha256 hex digest
+
+
+def file_checksum(path: str, chunk_size: int = 64 * 1024) -> str:
+    """sha256 of file, read in chunks"""
+
+    checksum = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class MediaStore:
+    """
+    Content-addressed files: {root}/{hash[:2]}/{hash[2:4]}/{hash}{extension}.
+    Name is sha256 of file content, so identical images are stored once.
+    References are counted in database (MediaRepo), unreferenced files are removed
+    by collect_garbage.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root: str = root
+
+    def path(self, checksum: str, extension: str = ".png") -> str:
+        return os.path.join(
+            self.root, checksum[:2], checksum[2:4], f"{checksum}{extension}"
+        )
+
+    def contains(self, path: str) -> bool:
+        """True if path is a content-addressed file of this store"""
+        checksum: str = self.checksum_of(path)
+        return len(checksum) == CHECKSUM_LENGTH and os.path.abspath(
+            path
+        ) == os.path.abspath(self.path(checksum, os.path.splitext(path)[1]))
+
+    @staticmethod
+    def checksum_of(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def stored(self, path: str) -> StoredFile:
+        """Metadata of file already kept in store, checksum is taken from its name"""
+        return StoredFile(
+            path=path, size=os.path.getsize(path), checksum=self.checksum_of(path)
+        )
+
+    def put_file(self, path: str) -> StoredFile:
+        """Add existing file. Hard linked, copied only across file systems"""
+
+        try:
+            size: int = os.stat(path).st_size
+        except FileNotFoundError:
+            raise NoImageFoundException
+
+        checksum: str = file_checksum(path)
+        target: str = self.path(checksum, os.path.splitext(path)[1] or ".png")
+        if not self._reuse(target):
+            self._publish(target, lambda tmp_path: self._link_or_copy(path, tmp_path))
+        return StoredFile(path=target, size=size, checksum=checksum)
+
+    def put_bytes(self, content: bytes, extension: str = ".png") -> StoredFile:
+        checksum: str = hashlib.sha256(content).hexdigest()
+        target: str = self.path(checksum, extension)
+        if not self._reuse(target):
+            self._publish(target, lambda tmp_path: self._write(tmp_path, content))
+        return StoredFile(path=target, size=len(content), checksum=checksum)
+
+    @staticmethod
+    def _reuse(target: str) -> bool:
+        """
+        True if target is already stored. Its ctime is renewed (times are kept), so
+        collect_garbage running before the new reference is committed keeps the file.
+        """
+
+        try:
+            stat: os.stat_result = os.stat(target)
+            os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        except FileNotFoundError:
+            return False
+        return True
+
+    @staticmethod
+    def _link_or_copy(source: str, target: str) -> None:
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+    @staticmethod
+    def _write(target: str, content: bytes) -> None:
+        with open(target, "wb") as f:
+            f.write(content)
+
+    @staticmethod
+    def _publish(target: str, create: Callable[[str], None]) -> None:
+        """Create file under temporary name and rename, so no partial files are seen"""
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path: str = os.path.join(os.path.dirname(target), f".{uuid.uuid4()}.tmp")
+        try:
+            create(tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def files(self) -> Iterator[str]:
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path: str = os.path.join(folder, name)
+                if self.contains(path):
+                    yield path
+
+    def collect_garbage(
+        self, referenced: Set[str], dry_run: bool = False, min_age: float = 60 * 60
+    ) -> Dict[str, int]:
+        """
+        Remove files whose checksum is not referenced. Files added in last `min_age`
+        seconds are kept, their rows may not be committed yet.
+        Returns summary of the run
+        """
+
+        summary: Dict[str, int] = {"kept": 0, "removed": 0, "freed_bytes": 0}
+        added_before: float = time.time() - min_age
+        for path in self.files():
+            # ctime changes when file is linked into store or reused by put_file/put_bytes,
+            # mtime is kept from source
+            recent: bool = os.stat(path).st_ctime > added_before
+            if recent or self.checksum_of(path) in referenced:
+                summary["kept"] += 1
+                continue
+            summary["removed"] += 1
+            summary["freed_bytes"] += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+                logger.info(f"Removed unreferenced file {path}")
+        return summary
@@ -1,11 +1,14 @@
+import asyncio
 import os
+from typing import Any
 
 from pydantic import BaseModel as PydanticBaseModel
 from sqlalchemy.orm import registry
 from tortoise import fields
 from tortoise.models import Model
 
-from repos.schemas import extra_models
+from repos.repo_types import StoredFile
+from repos.schemas import extra_models, FileField, ImageProxy
 from settings import Settings
 from utils.exceptions import NoImageFoundException
 
@@ -21,12 +24,8 @@ class Coords(PydanticBaseModel):
 
 def extra_params_validator(**kwargs) -> dict:
     if "image" in kwargs and isinstance(kwargs["image"], str):
-        image_path: str = kwargs["image"]
-        if not os.path.exists(image_path):
+        if not os.path.exists(kwargs["image"]):
             raise NoImageFoundException
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-        kwargs["image"] = image_data
 
     return kwargs
 
@@ -37,9 +36,30 @@ class BaseModel(Model):
         kwargs = extra_params_validator(**kwargs)
         return await super().create(**kwargs)
 
-    async def save(self, **kwargs):
+    async def save(self, *args, **kwargs):
         kwargs = extra_params_validator(**kwargs)
-        return await super().save(**kwargs)
+        await asyncio.to_thread(self.store_files)
+        return await super().save(*args, **kwargs)
+
+    def store_files(self) -> None:
+        """
+        Move new files of FileFields into upload_to. Size and checksum are saved
+        to `{field}_size` and `{field}_checksum` fields if model has them
+        """
+        for name, field in self._meta.fields_map.items():
+            value: Any = getattr(self, name, None)
+            if not isinstance(field, FileField) or not isinstance(value, ImageProxy):
+                continue
+            if field.is_stored(value.url) and getattr(self, f"{name}_checksum", None):
+                continue  # stored with metadata on previous save
+
+            stored: StoredFile = field.store(value.url)
+            if stored.path != value.url:
+                setattr(self, name, ImageProxy(stored.path))
+            if f"{name}_size" in self._meta.fields_map:
+                setattr(self, f"{name}_size", stored.size)
+            if f"{name}_checksum" in self._meta.fields_map:
+                setattr(self, f"{name}_checksum", stored.checksum)
 
     class Meta:
         abstract = True
@@ -48,6 +68,8 @@ class BaseModel(Model):
 class MoonModel(BaseModel):
     date = fields.DateField(unique=True)
     image = extra_models.FileField(upload_to=os.path.join(settings.MEDIA, "moon"))
+    image_size = fields.IntField(null=True)
+    image_checksum = fields.CharField(max_length=64, null=True)
     created = fields.DatetimeField(auto_now_add=True)
 
     class Meta:
@@ -55,4 +77,49 @@ class MoonModel(BaseModel):
         abstract = False
 
 
+class MediaModel(BaseModel):
+    checksum = fields.CharField(max_length=64, unique=True)
+    path = fields.TextField()
+    size = fields.IntField()
+    refcount = fields.IntField(default=0)
+
+    class Meta:
+        table = "media"
+        abstract = False
+
+
+class GeocodeModel(BaseModel):
+    city = fields.CharField(max_length=255, unique=True)
+    latitude = fields.FloatField(null=True)
+    longitude = fields.FloatField(null=True)
+    updated = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "geocode"
+        abstract = False
+
+
+class GridPointModel(BaseModel):
+    city = fields.CharField(max_length=255, unique=True)
+    act_x = fields.IntField(null=True)
+    act_y = fields.IntField(null=True)
+    updated = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "grid_point"
+        abstract = False
+
+
+class BackfillCheckpointModel(BaseModel):
+    job = fields.CharField(max_length=64, unique=True)
+    last_date = fields.DateField(null=True)
+    done = fields.IntField(default=0)
+    total = fields.IntField(default=0)
+    updated = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "backfill_checkpoint"
+        abstract = False
+
+
 # await MoonModel.create(date=datetime.now(), image='base.png', name='NOWEEEEE Moon')
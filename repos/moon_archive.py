@@ -0,0 +1,162 @@
+import datetime
+import io
+import mmap
+import os
+import struct
+from typing import Optional, Dict, Tuple
+
+from logger import ColoredLogger, get_module_logger
+from settings import Settings
+
+logger: ColoredLogger = get_module_logger("MOON_ARCHIVE")
+settings: Settings = Settings()
+
+# index record: date ordinal, offset in data file, length
+INDEX_RECORD: struct.Struct = struct.Struct("<iQI")
+
+
+class ArchiveReader(io.RawIOBase):
+    """Seekable read-only file over memoryview, bytes are copied only into read buffers"""
+
+    def __init__(self, view: memoryview) -> None:
+        super().__init__()
+        self._view: memoryview = view
+        self._position: int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size: int = min(len(buffer), len(self._view) - self._position)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._position : self._position + size]
+        self._position += size
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        start: int = {
+            io.SEEK_SET: 0,
+            io.SEEK_CUR: self._position,
+            io.SEEK_END: len(self._view),
+        }[whence]
+        self._position = max(start + offset, 0)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class MoonArchive:
+    """
+    Packed moon images. One append-only data file with images stored back to back
+    and an index file ({path}.idx) of fixed size (date, offset, length) records.
+    Index record is written after image data, so interrupted appends are ignored,
+    partial index record is truncated by next append.
+    Newer record for the same date wins. Reads are memoryview slices of mmapped
+    data file.
+    """
+
+    _shared: Optional["MoonArchive"] = None
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path: str = path or settings.MOON_ARCHIVE_PATH
+        self.index_path: str = f"{self.path}.idx"
+        self.index: Dict[int, Tuple[int, int]] = {}
+        self._index_read: int = 0  # bytes of index file already loaded
+        self._data_file = None
+        self._mmap: Optional[mmap.mmap] = None
+
+    @classmethod
+    def shared(cls) -> "MoonArchive":
+        """Process-wide archive kept open between commands"""
+
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def __len__(self) -> int:
+        self._refresh_index()
+        return len(self.index)
+
+    def __contains__(self, date: datetime.date) -> bool:
+        self._refresh_index()
+        return date.toordinal() in self.index
+
+    def _refresh_index(self) -> None:
+        """Load index records appended since last read (also by other processes)"""
+
+        try:
+            size: int = os.path.getsize(self.index_path)
+        except FileNotFoundError:
+            return
+        if size == self._index_read:
+            return
+
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_read)
+            content: bytes = f.read(size - self._index_read)
+
+        complete: int = len(content) - len(content) % INDEX_RECORD.size
+        for ordinal, offset, length in INDEX_RECORD.iter_unpack(content[:complete]):
+            self.index[ordinal] = (offset, length)
+        self._index_read += complete
+
+    def _view(self, end: int) -> memoryview:
+        """Data file mapping covering at least `end` bytes"""
+
+        if self._mmap is None or len(self._mmap) < end:
+            if self._data_file is None:
+                self._data_file = open(self.path, "rb")
+            # previous mapping stays valid for memoryviews still in use
+            self._mmap = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def get(self, date: datetime.date) -> Optional[memoryview]:
+        """Image for date as zero-copy slice of archive. None if date is not archived"""
+
+        self._refresh_index()
+        entry: Optional[Tuple[int, int]] = self.index.get(date.toordinal())
+        if entry is None:
+            return None
+        offset, length = entry
+        view: memoryview = self._view(offset + length)
+        if len(view) < offset + length:
+            logger.warning(f"Moon archive record for {date} points past data file")
+            return None
+        return view[offset : offset + length]
+
+    def open(self, date: datetime.date) -> Optional["ArchiveReader"]:
+        """Image for date as file object for uploads. None if date is not archived"""
+
+        view: Optional[memoryview] = self.get(date)
+        return ArchiveReader(view) if view is not None else None
+
+    def append(self, date: datetime.date, content: bytes) -> None:
+        with open(self.path, "ab") as data:
+            offset: int = data.tell()
+            data.write(content)
+            data.flush()
+            os.fsync(data.fileno())
+
+        record: bytes = INDEX_RECORD.pack(date.toordinal(), offset, len(content))
+        with open(self.index_path, "ab") as index:
+            # drop partial record of interrupted append, it would shift all next ones
+            torn: int = index.tell() % INDEX_RECORD.size
+            if torn:
+                index.truncate(index.tell() - torn)
+            index.write(record)
+        logger.info(f"Moon image for {date} archived ({len(content)} bytes)")
+
+    def append_file(self, date: datetime.date, path: str) -> None:
+        with open(path, "rb") as f:
+            self.append(date, f.read())
+
+    def close(self) -> None:
+        self._mmap = None
+        if self._data_file is not None:
+            self._data_file.close()
+            self._data_file = None
@@ -0,0 +1,35 @@
+import re
+from typing import Optional, Pattern
+
+from repos.repo_types import Coords2Points
+from utils.exceptions import ICMParserException
+
+# ICM pages are parsed with precompiled patterns straight from response bytes, no DOM is built
+NOT_FOUND: bytes = b"NIE ZNALEZIONO"
+SHOW_MGRAM: Pattern[bytes] = re.compile(rb"show_mgram\(\s*'?(\d+)")
+ACT_X: Pattern[bytes] = re.compile(rb"var\s+act_x\s*=\s*(\d+)")
+ACT_Y: Pattern[bytes] = re.compile(rb"var\s+act_y\s*=\s*(\d+)")
+
+
+def parse_mgram_id(content: bytes) -> Optional[int]:
+    """
+    Meteogram id from ICM search page (first show_mgram(<id>) link).
+    None if city was not found.
+    """
+    if NOT_FOUND in content:
+        return None
+
+    match: Optional[re.Match] = SHOW_MGRAM.search(content)
+    if not match:
+        raise ICMParserException()
+    return int(match.group(1))
+
+
+def parse_grid_points(content: bytes) -> Coords2Points:
+    """Grid points from meteogram page (var act_x/var act_y script variables)"""
+
+    act_x: Optional[re.Match] = ACT_X.search(content)
+    act_y: Optional[re.Match] = ACT_Y.search(content)
+    if not act_x or not act_y:
+        raise ICMParserException()
+    return Coords2Points(act_x=int(act_x.group(1)), act_y=int(act_y.group(1)))
@@ -3,3 +3,8 @@ from collections import namedtuple
 CropParams: namedtuple = namedtuple("MeteoBlueCrop", "top, right, bottom, left")
 Coords2Points = namedtuple("Coords2Points", "act_x, act_y")
 UmMeteoGram = namedtuple("UmMeteoGram", "base_img, extra_img")
+CacheEntry = namedtuple("CacheEntry", "value, expires")
+StoredFile = namedtuple("StoredFile", "path, size, checksum")
+MoonPhase = namedtuple(
+    "MoonPhase", "date, elongation, illumination, age, libration_long, libration_lat"
+)
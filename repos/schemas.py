@@ -1,13 +1,91 @@
 import os
-import uuid
 from io import BytesIO
-from typing import Union, Optional
+from typing import Union, Optional, Tuple
 
 from PIL import Image
 from tortoise import fields
 
+from repos.media_store import MediaStore
+from repos.repo_types import StoredFile
 from settings import Settings
 from utils.exceptions import UploadToNotGivenException
+from utils.executor import ImageExecutor
+
+
+def decode_image(value: Union[bytes, str]) -> Image.Image:
+    """Image from file path (with `url` attribute) or from bytes"""
+
+    if isinstance(value, str):
+        path: str = value
+        with open(value, "rb") as f:
+            value: bytes = f.read()
+            img: Image = Image.open(BytesIO(value))
+            setattr(img, "url", path)
+            return img
+    img: Image = Image.open(BytesIO(value))
+    return img
+
+
+class ImageProxy:
+    """
+    Path-backed image returned by FileField. Pixels are decoded only when
+    open()/load() is called, decoded image is released by close().
+    Usage:
+        with moon.image as img:
+            img.crop(...)
+    """
+
+    def __init__(self, url: str) -> None:
+        self.url: str = url
+        self._image: Optional[Image.Image] = None
+        self._size: Optional[Tuple[int, int]] = None
+
+    def __repr__(self) -> str:
+        return f"<ImageProxy url={self.url!r}>"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ImageProxy) and other.url == self.url
+
+    def __hash__(self) -> int:
+        return hash(self.url)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) read from file header, pixels are not decoded"""
+        if self._image is not None:
+            return self._image.size
+        if self._size is None:
+            with Image.open(self.url) as img:
+                self._size = img.size
+        return self._size
+
+    @property
+    def file_size(self) -> int:
+        return os.path.getsize(self.url)
+
+    def open(self) -> Image.Image:
+        """Decoded image. Decoding happens once, until close()"""
+        if self._image is None:
+            self._image = decode_image(self.url)
+            self._image.load()
+        return self._image
+
+    async def load(self) -> Image.Image:
+        """open() run in image executor, off the event loop"""
+        if self._image is None:
+            self._image = await ImageExecutor.shared().run(self.open)
+        return self._image
+
+    def close(self) -> None:
+        if self._image is not None:
+            self._image.close()
+            self._image = None
+
+    def __enter__(self) -> Image.Image:
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
 
 
 class FileField(fields.TextField):
@@ -27,25 +105,38 @@ class FileField(fields.TextField):
     def upload_to_getter(self):
         return self.upload_to
 
+    @property
+    def media(self) -> MediaStore:
+        return MediaStore(self.upload_to_getter)
+
+    def is_stored(self, path: str) -> bool:
+        """True if file is already kept in content-addressed upload_to"""
+        return self.media.contains(path)
+
+    def store(self, path: str) -> StoredFile:
+        """
+        Put existing file into content-addressed upload_to without reading it
+        into memory. Identical files are stored once.
+        """
+        if self.is_stored(path):
+            return self.media.stored(path)
+        return self.media.put_file(path)
+
     def to_db_value(self, value: Union[str, bytes, None], instance) -> Optional[str]:
+        if isinstance(value, ImageProxy):
+            return value.url
         if isinstance(value, Image.Image):
-            path: str = os.path.join(self.upload_to_getter, f"{uuid.uuid4()}.png")
-            value.save(path)
-            return path
+            buffer: BytesIO = BytesIO()
+            value.save(buffer, "png")
+            return self.media.put_bytes(buffer.getvalue()).path
         return super().to_db_value(value, instance)
 
     def to_python_value(
         self, value: Union[bytes, str]
-    ) -> Optional[Union[Image.Image, str]]:
+    ) -> Optional[Union[Image.Image, ImageProxy]]:
         if isinstance(value, str):
-            path: str = value
-            with open(value, "rb") as f:
-                value: bytes = f.read()
-                img: Image = Image.open(BytesIO(value))
-                setattr(img, "url", path)
-                return img
-        img: Image = Image.open(BytesIO(value))
-        return img
+            return ImageProxy(value)  # decoded lazily, only when pixels are needed
+        return decode_image(value)
 
     @upload_to_getter.setter
     def upload_to_getter(self, value):
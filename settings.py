@@ -1,22 +1,103 @@
+import importlib
 import os
-from typing import List
+from functools import lru_cache
+from typing import List, Optional, Tuple, Dict, Set
 
 import numpy
 from dotenv import load_dotenv
 
 from repos.repo_types import CropParams
+from utils.grid_index import GridIndex
+
+MATRIX_SHAPE: Tuple[int, int, int] = (616, 448, 2)
+
+
+def _compact_matrix_path(matrix_path: str) -> str:
+    """Create float32 copy of matrix next to the original file (once). Returns its path"""
+
+    compact_path: str = f"{matrix_path}.f32"
+    if os.path.isfile(compact_path) and os.path.getmtime(
+        compact_path
+    ) >= os.path.getmtime(matrix_path):
+        return compact_path
+
+    matrix: numpy.memmap = numpy.memmap(
+        matrix_path, dtype=numpy.float64, mode="r", shape=MATRIX_SHAPE
+    )
+    tmp_path: str = f"{compact_path}.{os.getpid()}.tmp"
+    matrix.astype(numpy.float32).tofile(tmp_path)
+    os.replace(tmp_path, compact_path)
+    return compact_path
+
+
+@lru_cache(maxsize=None)
+def load_matrix(matrix_path: str, compact: bool = False) -> Optional[numpy.ndarray]:
+    """
+    Read-only memory map of meteo grid matrix (.bin file). Loaded once per process,
+    pages are shared by all processes mapping the same file.
+    With compact=True float32 copy of the matrix is mapped (half of memory).
+    """
+
+    if not os.path.isfile(matrix_path):
+        return None
+
+    dtype: type = numpy.float64
+    if compact:
+        matrix_path = _compact_matrix_path(matrix_path)
+        dtype = numpy.float32
+
+    matrix: numpy.memmap = numpy.memmap(
+        matrix_path, dtype=dtype, mode="r", shape=MATRIX_SHAPE
+    )
+    GridIndex.for_array(matrix)
+    return matrix
 
 
 class Settings:
-    def __init__(self):
+    """
+    Process-wide settings. Every Settings() call returns the same object.
+    Expensive entries (matrix, DB config, directories) are computed on first access and cached.
+    """
+
+    _instance: Optional["Settings"] = None
+
+    # settings computed on first access: key -> method name
+    _lazy_settings: Dict[str, str] = {
+        "MATRIX_RESHAPE": "_load_matrix",
+        "DB_CONFIG": "_load_db_config",
+        "MOON_ARCHIVE_PATH": "_load_moon_archive_path",
+    }
+    # settings holding directories created on first access
+    _directories: Tuple[str, ...] = ("MEDIA", "LOGS_PATH")
+
+    def __new__(cls) -> "Settings":
+        if cls._instance is None:
+            instance: "Settings" = super().__new__(cls)
+            instance._load()
+            cls._instance = instance
+        return cls._instance
+
+    @classmethod
+    def reload(cls) -> "Settings":
+        """Drop cached and overridden values, load settings again. Mostly for tests."""
+
+        load_matrix.cache_clear()
+        instance: "Settings" = cls()
+        instance.__dict__.clear()
+        instance._load()
+        return instance
+
+    def _load(self) -> None:
 
         self._settings = {}
+        self._created_directories: Set[str] = set()
         self.ROOT_PATH: str = os.path.dirname(os.path.abspath(__file__))
 
         env_path: str = os.path.join(self.ROOT_PATH, ".env")
         load_dotenv(env_path)
 
         self._settings["BIN_PATH"]: str = ""
+        self._settings["MATRIX_COMPACT"]: bool = False
         self._settings["ROOT_PATH"]: str = self.ROOT_PATH
         self._settings[
             "METEO_BASE_PHOTO_URL"
@@ -48,7 +129,81 @@ class Settings:
         )
         self._settings["LOGS_PATH"]: str = os.path.join(self.ROOT_PATH, "logs")
         self._settings["DISCORD_LOGS"]: str = "logs/discord/{date}.log"
-        self._settings["DB_CONFIG"]: dict = {
+        self._settings["CHANNELS"] = {}
+        self._settings["HTTP_POOL_SIZE"]: int = 20
+        self._settings["HTTP_LIMIT_PER_HOST"]: int = 4
+        self._settings["HTTP_CONNECT_TIMEOUT"]: float = 5
+        self._settings["HTTP_READ_TIMEOUT"]: float = 20
+        self._settings["HTTP_KEEPALIVE_TIMEOUT"]: float = 30
+        self._settings["GEOCODE_CACHE_SIZE"]: int = 1024
+        self._settings["GEOCODE_CACHE_TTL"]: float = 30 * 24 * 60 * 60
+        self._settings["GEOCODE_NEGATIVE_TTL"]: float = 24 * 60 * 60
+        self._settings["GEOCODE_RATE_LIMIT"]: int = 1  # requests per second
+        self._settings["GRID_POINT_CACHE_SIZE"]: int = 1024
+        self._settings["GRID_POINT_CACHE_TTL"]: Optional[float] = None  # forever
+        # "not found" is kept one day only, ICM may find other spelling of the city
+        self._settings["GRID_POINT_NEGATIVE_TTL"]: float = 24 * 60 * 60
+        self._settings["UM_RUN_INTERVAL"]: int = 6  # hours between UM model runs
+        self._settings["UM_RUN_DELAY"]: int = 5  # hours until model run is published
+        self._settings["METEOGRAM_CACHE_MAX_BYTES"]: int = 200 * 1024 * 1024
+        self._settings["IMAGE_EXECUTOR"]: str = "thread"  # "thread" or "process"
+        self._settings["IMAGE_WORKERS"]: int = min(4, os.cpu_count() or 1)
+        self._settings["IMAGE_QUEUE_SIZE"]: int = 32  # jobs waiting for a worker
+        self._settings["MOON_SOURCE"]: str = "render"  # "render" or "scrape"
+        self._settings["MOON_RENDER_SIZE"]: int = 512
+        # render cache buckets: 3 degrees of elongation is ~6 hours of Moon age
+        self._settings["MOON_PHASE_STEP"]: float = 3.0
+        # degrees, None: libration is not rendered (more dates share one render)
+        self._settings["MOON_LIBRATION_STEP"]: Optional[float] = None
+        self._settings["MOON_RENDER_CACHE_SIZE"]: int = 512
+        self._settings["BACKFILL_LOG_EVERY"]: int = 10  # dates between progress logs
+        self._settings["BROWSER_POOL_SIZE"]: int = min(4, os.cpu_count() or 1)
+        self._settings["BROWSER_PAGES_PER_DRIVER"]: int = 50  # then driver is restarted
+        self._settings["BROWSER_RETRIES"]: int = 2
+        self._settings["BROWSER_WAIT_TIMEOUT"]: float = 10
+        self._settings["DB_BULK_BATCH_SIZE"]: int = 500  # rows per bulk upsert
+        self._settings["DB_WAIT_TIMEOUT"]: float = 60  # seconds until startup gives up
+        self._settings["DB_WAIT_BASE_DELAY"]: float = 0.5
+        self._settings["DB_WAIT_MAX_DELAY"]: float = 5
+        # seconds a command waits for database which was not ready at startup
+        self._settings["DB_RETRY_TIMEOUT"]: float = 2
+
+        try:
+            import _local_settings
+
+            if self.__class__._instance is not None:
+                importlib.reload(_local_settings)
+
+            for key in dir(_local_settings):
+                if not key.startswith("__") and not key.endswith("__"):
+                    self._settings[key] = getattr(_local_settings, key)
+        except ImportError:
+            pass
+
+    def __getattr__(self, key):
+        if key.startswith("__"):
+            raise AttributeError(key)
+
+        if key not in self._settings and key in self._lazy_settings:
+            self._settings[key] = getattr(self, self._lazy_settings[key])()
+
+        value = self._settings.get(key)
+        if key in self._directories and value not in self._created_directories:
+            os.makedirs(value, exist_ok=True)
+            self._created_directories.add(value)
+        return value
+
+    def _load_matrix(self) -> Optional[numpy.ndarray]:
+        return load_matrix(
+            self.matrix_path, compact=bool(self._settings["MATRIX_COMPACT"])
+        )
+
+    def _load_moon_archive_path(self) -> str:
+        return os.path.join(self.MEDIA, "moon.pack")
+
+    @staticmethod
+    def _load_db_config() -> dict:
+        return {
             "connections": {
                 "default": {
                     "engine": "tortoise.backends.asyncpg",
@@ -58,6 +213,8 @@ class Settings:
                         "user": os.getenv("DB_USERNAME", "postgres"),
                         "password": os.getenv("DB_PASSWORD", "postgres"),
                         "database": os.getenv("DB_NAME", "postgres"),
+                        "minsize": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+                        "maxsize": int(os.getenv("DB_POOL_MAX_SIZE", 10)),
                     },
                 },
             },
@@ -69,44 +226,21 @@ class Settings:
             },
             "default_connection": "default",
         }
-        self._settings["CHANNELS"] = {}
-
-        if not os.path.exists(self._settings["MEDIA"]):
-            os.mkdir(self._settings["MEDIA"])
-
-        if not os.path.exists(self._settings["LOGS_PATH"]):
-            os.mkdir(self._settings["LOGS_PATH"])
-
-        try:
-            import _local_settings
-
-            for key in dir(_local_settings):
-                if not key.startswith("__") and not key.endswith("__"):
-                    self._settings[key] = getattr(_local_settings, key)
-        except ImportError:
-            pass
-
-        matrix_path: str = self.ROOT_PATH
-        if self._settings["BIN_PATH"]:
-            matrix_path: str = os.path.join(self.ROOT_PATH, self._settings["BIN_PATH"])
-
-        self._settings["MATRIX_RESHAPE"] = None
-
-        if os.path.isfile(matrix_path):
-            matrix = numpy.fromfile(matrix_path)
-            self._settings["MATRIX_RESHAPE"] = numpy.reshape(matrix, (616, 448, 2))
-
-    def __getattr__(self, key):
-        return self._settings.get(key)
 
     def set_setting(self, key, value):
         self._settings[key] = value
         if key == "ROOT_PATH":
             self.ROOT_PATH = value
 
+    @property
+    def matrix_path(self) -> str:
+        if self._settings["BIN_PATH"]:
+            return os.path.join(self.ROOT_PATH, self._settings["BIN_PATH"])
+        return self.ROOT_PATH
+
     @property
     def db_config(self):
-        return self._settings["DB_CONFIG"]
+        return self.DB_CONFIG
 
     def __enter__(self):
         return self
@@ -1,5 +1,6 @@
 import os
 import tempfile
+from typing import Generator, Dict, Tuple, Union
 
 import numpy as np
 import pytest
@@ -9,7 +10,10 @@ from pytest_docker.plugin import Services
 from pytest_mock import MockerFixture
 
 from repos.api_repo import APIRepo
+from repos.cache_repo import MeteogramCache
 from repos.db_repo import MoonRepo
+from repos.moon_archive import MoonArchive
+from repos.http_client import HTTPResponse
 from use_cases.use_case import DiscordUseCase
 from settings import Settings
 
@@ -41,14 +45,45 @@ def disable_network_calls(monkeypatch):
     monkeypatch.setattr(requests, "get", lambda *args, **kwargs: stunted_get())
 
 
+@pytest.fixture(autouse=True)
+def _reload_settings() -> Generator[None, None, None]:
+    """Settings is a process-wide object. Restore it after every test"""
+
+    yield
+    Settings.reload()
+
+
 @pytest.fixture
-def discord_use_case() -> DiscordUseCase:
+def discord_use_case(tmp_path) -> DiscordUseCase:
     return DiscordUseCase(
         db_repo=MoonRepo,
         scrapper_repo=APIRepo,
+        meteogram_cache=MeteogramCache(folder=str(tmp_path / "meteograms")),
+        moon_archive=MoonArchive(str(tmp_path / "moon.pack")),
     )
 
 
+@pytest.fixture
+def http_responses(mocker: "MockerFixture") -> Dict[Tuple[str, str], Union[str, bytes]]:
+    """
+    Mock HTTPClient requests. Fill returned dict with (method, url): body pairs.
+    Not registered urls raise RuntimeError.
+    """
+
+    responses: Dict[Tuple[str, str], Union[str, bytes]] = {}
+
+    async def request(_, method: str, url: str, **kwargs) -> HTTPResponse:
+        if (method, url) not in responses:
+            raise RuntimeError("Network access not allowed during testing!")
+        content: Union[str, bytes] = responses[(method, url)]
+        if isinstance(content, str):
+            content = content.encode("iso-8859-2")
+        return HTTPResponse(status=200, url=url, content=content, encoding="iso-8859-2")
+
+    mocker.patch("repos.http_client.HTTPClient.request", request)
+    return responses
+
+
 @pytest.fixture
 def matrix() -> ndarray:
     arr: ndarray = np.array([el * 0.0005 for el in range(0, 551936)])
@@ -1,8 +1,6 @@
 import os
 
 import pytest
-import requests_mock
-from pytest_mock import MockerFixture
 
 from repos.api_repo import APIRepo
 from settings import Settings
@@ -11,65 +9,73 @@ settings: Settings = Settings()
 
 
 @pytest.mark.asyncio
-async def test_api_repo_fetch_data() -> None:
+async def test_api_repo_fetch_data_post(http_responses: dict) -> None:
     """Test if main method is working fine"""
     content: dict = {"data": {"name": "city_name"}}
-    with requests_mock.Mocker() as mock_request:
-        mock_request.post("https://example_url", json=content)
-        response = await APIRepo()._APIRepo__fetch_data_post("https://example_url", **content)  # type: ignore
+    http_responses[("POST", "https://example_url")] = '{"data": {"name": "city_name"}}'
+
+    response = await APIRepo()._APIRepo__fetch_data_post("https://example_url", **content)  # type: ignore
     assert response.json() == content
 
 
 @pytest.mark.asyncio
-async def test_api_repo_fetch_data(city_result_template, city_response) -> None:
+async def test_api_repo_fetch_data(
+    city_result_template, city_response, http_responses: dict
+) -> None:
     api_repo = APIRepo()
     api_repo.urls.UM_URL = "https://example_url_one"
     api_repo.urls.METEOGRAM_URL = "https://example_url_two"
 
     content: dict = {"data": {"name": "city_name"}}
 
-    with requests_mock.Mocker() as mock_request:
-        mock_request.post(api_repo.urls.UM_URL, text=city_result_template)
-        mock_request.get(api_repo.urls.METEOGRAM_URL, text=city_response)
+    http_responses[("POST", api_repo.urls.UM_URL)] = city_result_template
+    http_responses[("GET", api_repo.urls.METEOGRAM_URL)] = city_response
 
-        result = await api_repo.get_icm_result(**content)
+    result = await api_repo.get_icm_result(**content)
 
-        assert api_repo.urls.MGRAM_URL.split("?")[0] in result
-        assert "row=352" in result
-        assert "col=222" in result
+    assert api_repo.urls.MGRAM_URL.split("?")[0] in result
+    assert "row=352" in result
+    assert "col=222" in result
 
 
 @pytest.mark.asyncio
 async def test_api_repo_fetch_data_no_result(
-    city_result_template_no_res, city_response
+    city_result_template_no_res, city_response, http_responses: dict
 ) -> None:
     api_repo = APIRepo()
     api_repo.urls.UM_URL = "https://example_url_one"
 
     content: dict = {"data": {"name": "city_name"}}
 
-    with requests_mock.Mocker() as mock_request:
-        mock_request.post(api_repo.urls.UM_URL, text=city_result_template_no_res)
-        result = await api_repo.get_icm_result(**content)
+    http_responses[("POST", api_repo.urls.UM_URL)] = city_result_template_no_res
+    result = await api_repo.get_icm_result(**content)
 
-        assert not result
+    assert not result
 
 
 @pytest.mark.asyncio
-async def test_get_sat_img(mocker: "MockerFixture") -> None:
+async def test_get_sat_img(http_responses: dict, tmp_path) -> None:
     """test get_sat_img method"""
 
-    mocker.patch("urllib.request.urlretrieve", return_value=[])
+    settings.set_setting("MEDIA", str(tmp_path))
+    http_responses[("GET", APIRepo().urls.SAT)] = b"GIF89a"
     res: str = await APIRepo().get_sat_img()
-    expected: str = os.path.join(settings.MEDIA, "sat.gif")
+    expected: str = os.path.join(str(tmp_path), "sat.gif")
     assert res == expected
 
+    with open(res, "rb") as f:
+        assert f.read() == b"GIF89a"
+
 
 @pytest.mark.asyncio
-async def test_get_sat_infra_img(mocker: "MockerFixture") -> None:
+async def test_get_sat_infra_img(http_responses: dict, tmp_path) -> None:
     """test get_sat_infra_img method"""
 
-    mocker.patch("urllib.request.urlretrieve", return_value=[])
+    settings.set_setting("MEDIA", str(tmp_path))
+    http_responses[("GET", APIRepo().urls.SAT_INFRA)] = b"GIF89a"
     res: str = await APIRepo().get_sat_infra_img()
-    expected: str = os.path.join(settings.MEDIA, "infra_sat.gif")
+    expected: str = os.path.join(str(tmp_path), "infra_sat.gif")
     assert res == expected
+
+    with open(res, "rb") as f:
+        assert f.read() == b"GIF89a"
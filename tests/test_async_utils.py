@@ -0,0 +1,67 @@
+import asyncio
+import time
+from typing import List
+
+import pytest
+
+from utils.async_utils import AsyncRateLimiter, SingleFlight, abatch
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spacing() -> None:
+    """Test if entries are spaced by limiter interval"""
+
+    limiter: AsyncRateLimiter = AsyncRateLimiter(rate=10, period=1.0)
+    entered: List[float] = []
+
+    async def call() -> None:
+        async with limiter:
+            entered.append(time.monotonic())
+
+    await asyncio.gather(*(call() for _ in range(4)))
+
+    gaps: List[float] = [
+        later - earlier for earlier, later in zip(entered, entered[1:])
+    ]
+    assert len(entered) == 4
+    assert all(gap >= 0.09 for gap in gaps)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_calls() -> None:
+    """Test if concurrent calls with the same key share one call"""
+
+    single_flight: SingleFlight = SingleFlight()
+    started: List[str] = []
+
+    async def fetch(city: str) -> str:
+        started.append(city)
+        await asyncio.sleep(0.01)
+        return city.upper()
+
+    results: List[str] = await asyncio.gather(
+        single_flight.do("fetch", "a", fetch, "a"),
+        single_flight.do("fetch", "a", fetch, "a"),
+        single_flight.do("fetch", "b", fetch, "b"),
+    )
+
+    assert results == ["A", "A", "B"]
+    assert started == ["a", "b"]
+    assert single_flight.calls["fetch"] == 2
+    assert single_flight.deduplicated["fetch"] == 1
+
+    assert await single_flight.do("fetch", "a", fetch, "a") == "A"
+    assert started == ["a", "b", "a"]
+
+
+@pytest.mark.asyncio
+async def test_abatch() -> None:
+    """Test if iterables and async iterables are grouped into batches"""
+
+    async def stream():
+        for item in range(5):
+            yield item
+
+    assert [batch async for batch in abatch(range(5), 2)] == [[0, 1], [2, 3], [4]]
+    assert [batch async for batch in abatch(stream(), 5)] == [[0, 1, 2, 3, 4]]
+    assert [batch async for batch in abatch([], 3)] == []
@@ -0,0 +1,37 @@
+import datetime
+
+import pytest
+
+from repos.db_repo import CheckpointRepo
+from repos.models import BackfillCheckpointModel
+from utils.backfill import BackfillProgress
+from utils.db_utils import DBConnectionHandler
+
+DAY: datetime.date = datetime.date(2023, 2, 20)
+
+
+@pytest.mark.asyncio
+async def test_backfill_progress_checkpoint() -> None:
+    """Test if finished dates are checkpointed and next run sees previous one"""
+
+    async with DBConnectionHandler(generate_schemas=True):
+        progress: BackfillProgress = BackfillProgress("test_job", total=3, log_every=2)
+        assert await progress.start() is None
+        assert progress.eta is None
+
+        await progress.advance(DAY)
+        await progress.advance(DAY + datetime.timedelta(days=1))
+
+        checkpoint: BackfillCheckpointModel = await CheckpointRepo().get("test_job")
+        assert checkpoint.last_date == DAY + datetime.timedelta(days=1)
+        assert (checkpoint.done, checkpoint.total) == (2, 3)
+        assert progress.eta is not None and progress.eta >= 0
+
+        resumed: BackfillProgress = BackfillProgress("test_job", total=1)
+        previous: BackfillCheckpointModel = await resumed.start()
+        assert previous.done == 2
+        await resumed.advance(DAY + datetime.timedelta(days=2))
+
+        checkpoint = await CheckpointRepo().get("test_job")
+        assert (checkpoint.done, checkpoint.total) == (1, 1)
+        assert await BackfillCheckpointModel.filter(job="test_job").count() == 1
@@ -0,0 +1,110 @@
+import threading
+import time
+from typing import List, Dict
+
+import pytest
+from selenium.common import WebDriverException
+
+from utils.browser_pool import BrowserPool
+
+
+class FakeDriver:
+    def __init__(self) -> None:
+        self.quit_called: bool = False
+
+    def quit(self) -> None:
+        self.quit_called = True
+
+
+def make_factory(drivers: List[FakeDriver]):
+    def factory() -> FakeDriver:
+        driver: FakeDriver = FakeDriver()
+        drivers.append(driver)
+        return driver
+
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_browser_pool_runs_pages_in_parallel() -> None:
+    """Test if pages are loaded by `size` drivers at once and results are handed over"""
+
+    drivers: List[FakeDriver] = []
+    running: Dict[str, int] = {"now": 0, "max": 0}
+    lock: threading.Lock = threading.Lock()
+    saved: Dict[int, int] = {}
+
+    def job(driver: FakeDriver, item: int) -> int:
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.05)
+        with lock:
+            running["now"] -= 1
+        return item * 2
+
+    async def save(item: int, result: int) -> None:
+        saved[item] = result
+
+    async with BrowserPool(size=3, factory=make_factory(drivers)) as pool:
+        failed: list = await pool.run(range(6), job, save)
+
+    assert failed == []
+    assert saved == {item: item * 2 for item in range(6)}
+    assert running["max"] == 3
+    assert len(drivers) == 3
+    assert all(driver.quit_called for driver in drivers)
+
+
+@pytest.mark.asyncio
+async def test_browser_pool_recycles_and_retries() -> None:
+    """Test if driver is restarted after M pages and failed item is retried"""
+
+    drivers: List[FakeDriver] = []
+    attempts: Dict[int, int] = {}
+
+    def job(driver: FakeDriver, item: int) -> int:
+        attempts[item] = attempts.get(item, 0) + 1
+        if item == 1 and attempts[item] == 1:
+            raise WebDriverException("page crashed")
+        if item == 3:
+            raise WebDriverException("always broken")
+        return item
+
+    pool: BrowserPool = BrowserPool(
+        size=1, pages_per_driver=2, retries=1, factory=make_factory(drivers)
+    )
+    failed: list = await pool.run(range(5), job)
+    await pool.close()
+
+    assert failed == [3]
+    assert attempts == {0: 1, 1: 2, 2: 1, 3: 2, 4: 1}
+    assert pool.metrics["pages"] == 4
+    assert pool.metrics["retried"] == 2
+    assert pool.metrics["failed"] == 1
+    # last driver failed too, so it is quit instead of being kept for next run
+    assert pool.metrics["drivers_recycled"] == len(drivers) == 4
+    assert all(driver.quit_called for driver in drivers)
+
+
+@pytest.mark.asyncio
+async def test_browser_pool_does_not_reuse_failed_driver() -> None:
+    """Test if driver of a failed last page is not handed to the next run"""
+
+    drivers: List[FakeDriver] = []
+    used: Dict[str, FakeDriver] = {}
+
+    def job(driver: FakeDriver, item: str) -> str:
+        used[item] = driver
+        if item == "bad":
+            raise WebDriverException("page crashed")
+        return item
+
+    async with BrowserPool(size=1, retries=0, factory=make_factory(drivers)) as pool:
+        assert await pool.run(["bad"], job) == ["bad"]
+        assert await pool.run(["next"], job) == []
+
+    assert used["next"] is not used["bad"]
+    assert used["bad"].quit_called
+    assert pool.metrics["drivers_recycled"] == 1
+    assert all(driver.quit_called for driver in drivers)
@@ -0,0 +1,173 @@
+import os
+import time
+from typing import Optional, List
+
+import pytest
+from geopy.exc import GeocoderUnavailable, GeocoderTimedOut
+from pytest_mock import MockerFixture
+
+from repos.api_repo import APIRepo
+from repos.cache_repo import (
+    LRUCache,
+    CityCache,
+    GeocodeCache,
+    GridPointCache,
+    MeteogramCache,
+)
+from repos.models import Coords
+from repos.repo_types import CacheEntry, Coords2Points
+from utils.db_utils import DBConnectionHandler
+
+
+class LocationExample:
+    latitude: float = 52.23
+    longitude: float = 21.01
+
+
+def test_lru_cache_eviction_and_expiration() -> None:
+    """Test LRUCache size bound and TTL"""
+
+    cache: LRUCache = LRUCache(size=2)
+    cache.set("a", 1, expires=time.time() + 60)
+    cache.set("b", 2, expires=time.time() + 60)
+    cache.get("a")
+    cache.set("c", 3, expires=time.time() + 60)
+
+    assert cache.get("b") is None
+    assert cache.get("a").value == 1
+
+    cache.set("d", 4, expires=time.time() - 1)
+    assert cache.get("d") is None
+    assert len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_geocode_cache_without_database() -> None:
+    """Test in-memory tier. Database is not initialized, so it is skipped"""
+
+    cache: GeocodeCache = GeocodeCache(size=10, ttl=60, negative_ttl=60)
+    coords: Coords = Coords(latitude=50.06, longitude=19.94)
+
+    await cache.set("Kraków ", coords)
+    await cache.set("Nowhere", None)
+
+    hit: Optional[CacheEntry] = await cache.get("  krakow")
+    miss: Optional[CacheEntry] = await cache.get("Nowhere")
+
+    assert hit.value == coords
+    assert miss is not None
+    assert miss.value is None
+    assert await cache.get("Gdańsk") is None
+
+
+@pytest.mark.asyncio
+async def test_grid_point_cache_not_found_expires() -> None:
+    """Test if found grid points are kept forever and "not found" for a day"""
+
+    with pytest.raises(TypeError):
+        CityCache(size=1, ttl=1, negative_ttl=1, db_repo=None)  # type: ignore
+
+    cache: GridPointCache = GridPointCache()
+    found: CacheEntry = await cache.set("Warszawa", Coords2Points(act_x=1, act_y=2))
+    not_found: CacheEntry = await cache.set("Krakow", None)
+
+    assert found.expires == float("inf")
+    assert time.time() < not_found.expires <= time.time() + 24 * 60 * 60
+
+
+@pytest.mark.asyncio
+async def test_get_coords_cached(mocker: "MockerFixture") -> None:
+    """Test if APIRepo.get_coords geocodes city once. Not found result is cached too"""
+
+    calls: List[str] = []
+
+    async def geocode(city: str) -> Optional[LocationExample]:
+        calls.append(city)
+        return LocationExample() if city.startswith("War") else None
+
+    mocker.patch("repos.api_repo.APIRepo.geocode", side_effect=geocode)
+    api_repo: APIRepo = APIRepo(geocode_cache=GeocodeCache(ttl=60, negative_ttl=60))
+
+    first: Optional[Coords] = await api_repo.get_coords("Warszawa")
+    second: Optional[Coords] = await api_repo.get_coords("WARSZAWA")
+    await api_repo.get_coords("Nowhere")
+    not_found: Optional[Coords] = await api_repo.get_coords("nowhere")
+
+    assert first == second == Coords(latitude=52.23, longitude=21.01)
+    assert not_found is None
+    assert calls == ["Warszawa", "Nowhere"]
+
+
+@pytest.mark.asyncio
+async def test_get_coords_unavailable_not_cached(mocker: "MockerFixture") -> None:
+    """Test if geocoder errors (unavailable, timeout) are not cached"""
+
+    geocode = mocker.patch(
+        "repos.api_repo.APIRepo.geocode",
+        side_effect=[GeocoderUnavailable(), GeocoderTimedOut()],
+    )
+    api_repo: APIRepo = APIRepo(geocode_cache=GeocodeCache())
+
+    assert await api_repo.get_coords("Warszawa") is None
+    assert await api_repo.get_coords("Warszawa") is None
+    assert geocode.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_geocode_cache_database_tier() -> None:
+    """Test if geocoding results survive in database (new cache, empty LRU)"""
+
+    async with DBConnectionHandler(generate_schemas=True):
+        coords: Coords = Coords(latitude=54.35, longitude=18.65)
+        await GeocodeCache(ttl=60, negative_ttl=60).set("Gdańsk", coords)
+        await GeocodeCache(ttl=60, negative_ttl=60).set("Nowhere", None)
+
+        cache: GeocodeCache = GeocodeCache(ttl=60, negative_ttl=60)
+        hit: Optional[CacheEntry] = await cache.get("gdansk")
+        miss: Optional[CacheEntry] = await cache.get("nowhere")
+
+        assert hit.value == coords
+        assert miss.value is None
+        assert len(cache.memory) == 2
+
+        expired: GeocodeCache = GeocodeCache(ttl=60, negative_ttl=0.001)
+        time.sleep(0.01)
+        assert await expired.get("nowhere") is None
+
+
+def test_meteogram_cache_model_runs(tmp_path) -> None:
+    """Test if meteograms are served for their model run and older runs are evicted"""
+
+    cache: MeteogramCache = MeteogramCache(folder=str(tmp_path / "cache"))
+    points: Coords2Points = Coords2Points(act_x=222, act_y=352)
+
+    old: str = cache.put(points, "2023021900", b"old run")
+
+    assert cache.get(points, "2023021900") == b"old run"
+    assert cache.get(points, "2023021906") is None
+
+    new: str = cache.put(points, "2023021906", b"new run")
+
+    assert cache.get(points, "2023021906") == b"new run"
+    assert os.path.isfile(new)
+    assert not os.path.exists(old)
+    assert os.listdir(os.path.dirname(new)) == ["222_352.png"]
+
+
+def test_meteogram_cache_size_bound(tmp_path) -> None:
+    """Test if least recently used meteograms are removed over max_bytes"""
+
+    cache: MeteogramCache = MeteogramCache(folder=str(tmp_path / "cache"), max_bytes=20)
+
+    for act_x in range(3):
+        if act_x == 2:
+            cache.get(Coords2Points(act_x=0, act_y=1), "2023021900")
+        path: str = cache.put(
+            Coords2Points(act_x=act_x, act_y=1), "2023021900", b"0123456789"
+        )
+        if act_x < 2:
+            os.utime(path, (act_x, act_x))
+
+    assert cache.get(Coords2Points(act_x=0, act_y=1), "2023021900")
+    assert cache.get(Coords2Points(act_x=1, act_y=1), "2023021900") is None
+    assert cache.get(Coords2Points(act_x=2, act_y=1), "2023021900")
@@ -9,11 +9,14 @@ from pytest_mock import MockerFixture
 from tortoise.exceptions import IntegrityError
 
 from settings import Settings
-from repos.db_repo import MoonRepo
-from repos.models import MoonModel
+from repos.db_repo import MoonRepo, MediaRepo
+from repos.models import MoonModel, MediaModel
 from repos.repo_types import UmMeteoGram
+from repos.media_store import file_checksum, MediaStore
+from repos.schemas import ImageProxy
 from tests.tests_utils import create_images
 from utils.db_utils import DBConnectionHandler
+from utils.exceptions import NoImageFoundException
 
 settings: Settings = Settings()
 
@@ -32,7 +35,7 @@ async def test_db_repo(mocker: "MockerFixture") -> None:
         )
         os.makedirs(os.path.join(images.base_img.root_path, "moon"))
 
-        async with DBConnectionHandler():
+        async with DBConnectionHandler(generate_schemas=True):
             date: datetime = datetime.datetime.now()
             mongo_repo: MoonRepo = MoonRepo()
             res = await mongo_repo.create(date=date, image=images.base_img.url)
@@ -43,3 +46,95 @@ async def test_db_repo(mocker: "MockerFixture") -> None:
             assert res.pk
             assert len(result) == 1
             assert str(date) == str(res.date)
+
+            image: ImageProxy = await mongo_repo.get_by_date(date.date())
+            assert image.url == result[0].image.url
+            assert image.size == images.base_img.size
+            assert await mongo_repo.get_by_date(date.date().replace(year=2000)) is None
+
+            # stored without copying: hard link in content-addressed upload_to
+            stored: MoonModel = result[0]
+            moon_dir: str = os.path.join(images.base_img.root_path, "moon")
+            assert MediaStore(moon_dir).contains(stored.image.url)
+            assert os.path.samefile(stored.image.url, images.base_img.url)
+            assert stored.image_size == os.path.getsize(images.base_img.url)
+            assert stored.image_checksum == file_checksum(images.base_img.url)
+
+            # same image for another date is stored once and referenced twice
+            other: MoonModel = await mongo_repo.create(
+                date=date - datetime.timedelta(days=1), image=images.base_img.url
+            )
+            assert other.image.url == stored.image.url
+            assert await MediaRepo().referenced() == {stored.image_checksum}
+            assert await mongo_repo.stored_dates(
+                date.date() - datetime.timedelta(days=5), date.date()
+            ) == {date.date(), date.date() - datetime.timedelta(days=1)}
+            assert await mongo_repo.stored_dates(date.date(), date.date()) == {
+                date.date()
+            }
+
+            assert await mongo_repo.delete(date.date())
+            assert await MediaRepo().referenced() == {stored.image_checksum}
+            assert await mongo_repo.delete(other.date)
+            assert await MediaRepo().referenced() == set()
+            assert not await mongo_repo.delete(other.date)
+
+
+@pytest.mark.asyncio
+async def test_db_repo_missing_image() -> None:
+    """Test if not existing image path is rejected before insert"""
+
+    async with DBConnectionHandler(generate_schemas=True):
+        with pytest.raises(NoImageFoundException):
+            await MoonRepo().create(
+                date=datetime.date.today(), image="/not/existing.png"
+            )
+        assert not await MoonRepo().all()
+
+
+@pytest.mark.asyncio
+async def test_db_repo_bulk_upsert(mocker: "MockerFixture") -> None:
+    """Test if records from async stream are saved in batches and dates are replaced"""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        images: UmMeteoGram = create_images(tmp_dir)
+        moon_dir: str = os.path.join(images.base_img.root_path, "moon")
+        mocker.patch(
+            "repos.schemas.FileField.upload_to_getter",
+            return_value=moon_dir,
+            new_callable=PropertyMock,
+        )
+        os.makedirs(moon_dir)
+        day: datetime.date = datetime.date(2023, 2, 20)
+        days: List[datetime.date] = [day + datetime.timedelta(days=n) for n in range(5)]
+
+        async def records():
+            for date in days:
+                yield date, images.base_img.url
+
+        async with DBConnectionHandler(generate_schemas=True):
+            repo: MoonRepo = MoonRepo()
+            flush = mocker.spy(repo, "_upsert_batch")
+
+            assert await repo.bulk_upsert(records(), batch_size=2) == 5
+            assert flush.call_count == 3
+            assert await repo.stored_dates(days[0], days[-1]) == set(days)
+
+            base_checksum: str = file_checksum(images.base_img.url)
+            media: MediaModel = await MediaModel.get(checksum=base_checksum)
+            assert media.refcount == 5
+
+            # replace two dates, extra image is counted, base one is released
+            replaced: int = await repo.bulk_upsert(
+                [(days[0], images.extra_img.url), (days[1], images.extra_img.url)]
+            )
+            assert replaced == 2
+            assert await MoonModel.all().count() == 5
+
+            stored: MoonModel = await MoonModel.get(date=days[0])
+            assert stored.image_checksum == file_checksum(images.extra_img.url)
+            assert MediaStore(moon_dir).contains(stored.image.url)
+            await media.refresh_from_db()
+            assert media.refcount == 3
+            extra: MediaModel = await MediaModel.get(checksum=stored.image_checksum)
+            assert extra.refcount == 2
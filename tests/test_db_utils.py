@@ -0,0 +1,110 @@
+import asyncio
+import copy
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+import utils.db_utils
+from settings import Settings
+from utils.db_utils import (
+    DBConnectionHandler,
+    init_db,
+    ensure_db,
+    wait_for_db,
+    close_db,
+    db_health_check,
+    db_initialized,
+)
+from utils.exceptions import DBConnectionError
+
+
+@pytest.mark.asyncio
+async def test_db_lifecycle() -> None:
+    """Test if pool opened once is reused by handler and reported healthy"""
+
+    assert not await db_health_check()
+
+    await init_db()
+    try:
+        assert await db_health_check()
+
+        async with DBConnectionHandler():
+            assert await db_health_check()
+
+        # handler did not open the pool, so it must not close it
+        assert db_initialized()
+        assert await db_health_check()
+    finally:
+        await close_db()
+
+    assert not db_initialized()
+    assert not await db_health_check()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_db_gives_up_after_timeout(mocker: "MockerFixture") -> None:
+    """Test if unreachable database is retried with backoff until deadline"""
+
+    db_config: dict = copy.deepcopy(Settings().db_config)
+    db_config["connections"]["default"]["credentials"]["port"] = 1  # nothing listens
+    mocker.patch("settings.Settings.db_config", db_config)
+    Settings().set_setting("DB_WAIT_TIMEOUT", 0.5)
+    Settings().set_setting("DB_WAIT_MAX_DELAY", 0.2)
+    sleep = mocker.spy(asyncio, "sleep")
+    close_db_spy = mocker.spy(utils.db_utils, "close_db")
+
+    started: float = time.monotonic()
+    with pytest.raises(DBConnectionError):
+        async with DBConnectionHandler():
+            pass
+
+    assert time.monotonic() - started < 2
+    assert sleep.call_count >= 2
+    assert all(call.args[0] <= 0.2 for call in sleep.call_args_list)
+    assert not db_initialized()
+    close_db_spy.assert_awaited_once()
+
+    # next init_db waits for database again
+    with pytest.raises(DBConnectionError):
+        await init_db()
+    assert sleep.call_count >= 4
+
+
+@pytest.mark.asyncio
+async def test_wait_for_db_limits_hanging_attempt(mocker: "MockerFixture") -> None:
+    """Test if a connect attempt which hangs is cut at the deadline"""
+
+    async def hang(*args, **kwargs) -> None:
+        await asyncio.sleep(60)
+
+    client = mocker.Mock(execute_query=hang)
+    mocker.patch("utils.db_utils.connections.get", return_value=client)
+
+    started: float = time.monotonic()
+    with pytest.raises(DBConnectionError):
+        await wait_for_db(timeout=0.3)
+
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_ensure_db_retries_after_failed_startup(mocker: "MockerFixture") -> None:
+    """Test if database which was down at startup is initialized on later call"""
+
+    db_config: dict = copy.deepcopy(Settings().db_config)
+    unreachable: dict = copy.deepcopy(db_config)
+    unreachable["connections"]["default"]["credentials"]["port"] = 1
+    mocker.patch("settings.Settings.db_config", unreachable)
+    Settings().set_setting("DB_RETRY_TIMEOUT", 0.1)
+
+    assert not await ensure_db()
+    assert not db_initialized()
+
+    mocker.patch("settings.Settings.db_config", db_config)
+    try:
+        assert await ensure_db()
+        assert db_initialized()
+        assert await db_health_check()
+    finally:
+        await close_db()
@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.exceptions import ExecutorQueueFullException
+from utils.executor import ImageExecutor
+
+
+@pytest.mark.asyncio
+async def test_image_executor_runs_off_loop() -> None:
+    """Test if job runs in worker thread and metrics are collected"""
+
+    executor: ImageExecutor = ImageExecutor(workers=2, max_queue=4)
+
+    thread_name: str = await executor.run(lambda: threading.current_thread().name)
+
+    assert thread_name != threading.current_thread().name
+    assert executor.metrics["submitted"] == 1
+    assert executor.metrics["completed"] == 1
+    executor.close()
+
+
+@pytest.mark.asyncio
+async def test_image_executor_bounded_queue() -> None:
+    """Test if jobs over workers + max_queue are rejected and queue wait is measured"""
+
+    executor: ImageExecutor = ImageExecutor(workers=1, max_queue=1)
+    started: threading.Event = threading.Event()
+    release: threading.Event = threading.Event()
+
+    def block() -> bool:
+        started.set()
+        return release.wait(5)
+
+    running = asyncio.create_task(executor.run(block))
+    waiting = asyncio.create_task(executor.run(sum, [1, 2]))
+    assert await asyncio.to_thread(started.wait, 5)
+
+    with pytest.raises(ExecutorQueueFullException):
+        await executor.run(sum, [3])
+
+    # `waiting` is queued by now and cannot start before `running` is released
+    queued_by: float = time.monotonic()
+    await asyncio.sleep(0.01)
+    released_at: float = time.monotonic()
+    release.set()
+
+    assert await running
+    assert await waiting == 3
+    assert executor.metrics["rejected"] == 1
+    assert executor.metrics["queue_wait_max"] >= released_at - queued_by
+    assert executor.queue_wait_avg > 0
+    executor.close()
@@ -0,0 +1,53 @@
+from typing import Tuple
+
+import numpy
+from numpy import ndarray
+
+from utils.grid_index import GridIndex
+
+
+def brute_force_nearest(long: float, lat: float, array: ndarray) -> Tuple[int, int]:
+    """Reference implementation - full distance field with argmin"""
+
+    distance: ndarray = numpy.sqrt(
+        (array[:, :, 1] - long) ** 2 + (array[:, :, 0] - lat) ** 2
+    )
+    row, column = numpy.unravel_index(numpy.argmin(distance), distance.shape)
+    return int(row), int(column)
+
+
+def test_grid_index_matches_brute_force(matrix: ndarray) -> None:
+    """Test if index returns the same points as full argmin search"""
+
+    index: GridIndex = GridIndex(matrix)
+    random: numpy.random.Generator = numpy.random.default_rng(0)
+
+    for _ in range(200):
+        long: float = random.uniform(-5, 280)
+        lat: float = random.uniform(-5, 280)
+        assert index.nearest(lat=lat, long=long) == brute_force_nearest(
+            long, lat, matrix
+        )
+
+
+def test_grid_index_ties_resolved_like_argmin() -> None:
+    """Test equal distances. Lowest flat index should win, like in numpy.argmin"""
+
+    grid: ndarray = numpy.indices((20, 10)).astype(float)
+    array: ndarray = numpy.stack([grid[0], grid[1]], axis=-1)
+    index: GridIndex = GridIndex(array)
+
+    for lat in numpy.arange(-2, 22, 0.5):
+        for long in numpy.arange(-2, 12, 0.5):
+            assert index.nearest(lat=lat, long=long) == brute_force_nearest(
+                long, lat, array
+            )
+
+
+def test_grid_index_cached_per_array(matrix: ndarray) -> None:
+    """Test if index is built once for the same matrix"""
+
+    index: GridIndex = GridIndex.for_array(matrix)
+
+    assert GridIndex.for_array(matrix) is index
+    assert GridIndex.for_array(matrix.copy()) is not index
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import aiohttp
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from repos.http_client import HTTPClient, HTTPResponse
+
+
+async def hello(request: web.Request) -> web.Response:
+    return web.Response(text=request.headers.get("Host", ""), charset="utf-8")
+
+
+async def slow(_: web.Request) -> web.Response:
+    await asyncio.sleep(1)
+    return web.Response(text="too late")
+
+
+@pytest_asyncio.fixture
+async def server():
+    app: web.Application = web.Application()
+    app.router.add_get("/", hello)
+    app.router.add_get("/slow", slow)
+    async with TestServer(app) as test_server:
+        yield test_server
+
+
+@pytest.mark.asyncio
+async def test_http_client_reuses_connection(server: TestServer) -> None:
+    """Test if session and connections are shared between requests"""
+
+    client: HTTPClient = HTTPClient(limit_per_host=1)
+    try:
+        first: HTTPResponse = await client.get(
+            str(server.make_url("/")), headers={"Host": "www.meteo.pl"}
+        )
+        session: aiohttp.ClientSession = client.session
+        await client.get(str(server.make_url("/")))
+
+        assert first.status == 200
+        assert first.text != "www.meteo.pl"
+        assert client.session is session
+        assert len(session.connector._conns) == 1  # noqa
+    finally:
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_http_client_read_timeout(server: TestServer) -> None:
+    """Test if slow response is cut by read timeout"""
+
+    client: HTTPClient = HTTPClient(read_timeout=0.1)
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await client.get(str(server.make_url("/slow")))
+    finally:
+        await client.close()
+
+
+def test_http_client_closes_session_of_finished_loop() -> None:
+    """Test if session of previous event loop is closed when loop changes"""
+
+    async def get_session(client: HTTPClient) -> aiohttp.ClientSession:
+        return client.session
+
+    client: HTTPClient = HTTPClient()
+    first: aiohttp.ClientSession = asyncio.run(get_session(client))
+    connector: aiohttp.BaseConnector = first.connector
+    second: aiohttp.ClientSession = asyncio.run(get_session(client))
+
+    assert second is not first
+    assert first.closed
+    assert connector.closed
+    asyncio.run(client.close())
+
+
+def test_http_client_refuses_second_running_loop() -> None:
+    """Test if session of a loop which is still running is kept"""
+
+    client: HTTPClient = HTTPClient()
+    other: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    thread: threading.Thread = threading.Thread(target=other.run_forever)
+    thread.start()
+
+    async def get_session() -> aiohttp.ClientSession:
+        return client.session
+
+    try:
+        session: aiohttp.ClientSession = asyncio.run_coroutine_threadsafe(
+            get_session(), other
+        ).result()
+        with pytest.raises(RuntimeError):
+            asyncio.run(get_session())
+
+        assert client._session is session  # noqa
+        assert not session.closed
+        asyncio.run_coroutine_threadsafe(client.close(), other).result()
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join()
+        other.close()
@@ -0,0 +1,61 @@
+import os
+import time
+from typing import Dict
+
+from repos.media_store import MediaStore, file_checksum
+from repos.repo_types import StoredFile
+
+
+def test_media_store_deduplicates(tmp_path) -> None:
+    """Test if identical content is stored once under its checksum"""
+
+    store: MediaStore = MediaStore(str(tmp_path / "store"))
+    source: str = str(tmp_path / "moon.png")
+    with open(source, "wb") as f:
+        f.write(b"moon phase")
+
+    from_file: StoredFile = store.put_file(source)
+    from_bytes: StoredFile = store.put_bytes(b"moon phase")
+
+    assert from_file == from_bytes
+    assert from_file.checksum == file_checksum(source)
+    assert from_file.size == 10
+    assert from_file.path == store.path(from_file.checksum)
+    assert store.contains(from_file.path)
+    assert not store.contains(source)
+    assert list(store.files()) == [from_file.path]
+
+
+def test_media_store_collect_garbage(tmp_path) -> None:
+    """Test if only old unreferenced files are removed"""
+
+    store: MediaStore = MediaStore(str(tmp_path / "store"))
+    used: StoredFile = store.put_bytes(b"used")
+    unused: StoredFile = store.put_bytes(b"unused")
+
+    summary: Dict[str, int] = store.collect_garbage({used.checksum})
+    assert summary == {"kept": 2, "removed": 0, "freed_bytes": 0}
+
+    summary = store.collect_garbage({used.checksum}, dry_run=True, min_age=0)
+    assert summary == {"kept": 1, "removed": 1, "freed_bytes": 6}
+    assert os.path.exists(unused.path)
+
+    store.collect_garbage({used.checksum}, min_age=0)
+    assert os.path.exists(used.path)
+    assert not os.path.exists(unused.path)
+
+
+def test_media_store_reuse_renews_ctime(tmp_path) -> None:
+    """Test if storing existing content again protects the file from collect_garbage"""
+
+    store: MediaStore = MediaStore(str(tmp_path / "store"))
+    stored: StoredFile = store.put_bytes(b"full moon")
+    before: os.stat_result = os.stat(stored.path)
+    time.sleep(0.2)
+
+    store.put_bytes(b"full moon")
+    after: os.stat_result = os.stat(stored.path)
+
+    assert after.st_ctime_ns > before.st_ctime_ns
+    assert after.st_mtime_ns == before.st_mtime_ns
+    assert store.collect_garbage(set(), min_age=0.1)["kept"] == 1
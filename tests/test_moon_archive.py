@@ -0,0 +1,92 @@
+import datetime
+import os
+
+from repos.moon_archive import MoonArchive, ArchiveReader, INDEX_RECORD
+
+DAY: datetime.date = datetime.date(2023, 2, 20)
+
+
+def test_moon_archive_append_and_read(tmp_path) -> None:
+    """Test if images are read back as slices and newer record wins"""
+
+    archive: MoonArchive = MoonArchive(str(tmp_path / "moon.pack"))
+    archive.append(DAY, b"first")
+    archive.append(DAY + datetime.timedelta(days=1), b"second")
+
+    view: memoryview = archive.get(DAY)
+    assert isinstance(view, memoryview)
+    assert bytes(view) == b"first"
+    assert archive.get(DAY - datetime.timedelta(days=1)) is None
+
+    archive.append(DAY, b"replaced")
+    assert bytes(archive.get(DAY)) == b"replaced"
+    assert bytes(view) == b"first"  # old slices stay valid after remapping
+    assert len(archive) == 2
+    archive.close()
+
+
+def test_moon_archive_sees_other_writers(tmp_path) -> None:
+    """Test if reader picks up appends of other instance and skips partial records"""
+
+    path: str = str(tmp_path / "moon.pack")
+    reader: MoonArchive = MoonArchive(path)
+    assert reader.get(DAY) is None
+
+    MoonArchive(path).append(DAY, b"moon")
+    with open(f"{path}.idx", "ab") as index:
+        index.write(INDEX_RECORD.pack(DAY.toordinal() + 1, 0, 4)[:5])  # interrupted
+
+    assert bytes(reader.get(DAY)) == b"moon"
+    assert DAY + datetime.timedelta(days=1) not in reader
+    assert os.path.getsize(path) == 4
+    reader.close()
+
+
+def test_moon_archive_append_after_torn_record(tmp_path) -> None:
+    """Test if append after interrupted index write keeps records aligned"""
+
+    path: str = str(tmp_path / "moon.pack")
+    archive: MoonArchive = MoonArchive(path)
+    archive.append(DAY, b"moon")
+    with open(f"{path}.idx", "ab") as index:
+        index.write(INDEX_RECORD.pack(DAY.toordinal() + 1, 0, 4)[:5])  # interrupted
+
+    next_day: datetime.date = DAY + datetime.timedelta(days=2)
+    archive.append(next_day, b"next")
+
+    assert bytes(MoonArchive(path).get(next_day)) == b"next"
+    assert bytes(archive.get(next_day)) == b"next"
+    assert bytes(archive.get(DAY)) == b"moon"
+    assert os.path.getsize(f"{path}.idx") == 2 * INDEX_RECORD.size
+    archive.close()
+
+
+def test_moon_archive_rejects_record_past_data(tmp_path) -> None:
+    """Test if index record pointing past end of data file is not served"""
+
+    path: str = str(tmp_path / "moon.pack")
+    archive: MoonArchive = MoonArchive(path)
+    archive.append(DAY, b"moon")
+    with open(f"{path}.idx", "ab") as index:
+        index.write(INDEX_RECORD.pack(DAY.toordinal() + 1, 2, 100))
+
+    assert archive.get(DAY + datetime.timedelta(days=1)) is None
+    assert bytes(archive.get(DAY)) == b"moon"
+    archive.close()
+
+
+def test_archive_reader(tmp_path) -> None:
+    """Test if reader behaves like seekable binary file"""
+
+    archive: MoonArchive = MoonArchive(str(tmp_path / "moon.pack"))
+    archive.append(DAY, b"0123456789")
+
+    reader: ArchiveReader = archive.open(DAY)
+
+    assert reader.read(4) == b"0123"
+    assert reader.tell() == 4
+    assert reader.read() == b"456789"
+    assert reader.seek(0) == 0
+    assert reader.read() == b"0123456789"
+    assert archive.open(DAY - datetime.timedelta(days=1)) is None
+    archive.close()
@@ -0,0 +1,20 @@
+import os
+
+from moon_manager import MoonManager
+
+
+def test_write_file_keeps_linked_file(tmp_path) -> None:
+    """Test if rewriting a day replaces the file instead of changing its hard link"""
+
+    file_path: str = str(tmp_path / "2023-02-20.png")
+    stored: str = str(tmp_path / "stored.png")
+    MoonManager.write_file(file_path, b"old render")
+    os.link(file_path, stored)
+
+    MoonManager.write_file(file_path, b"new render")
+
+    with open(file_path, "rb") as f:
+        assert f.read() == b"new render"
+    with open(stored, "rb") as f:
+        assert f.read() == b"old render"
+    assert sorted(os.listdir(tmp_path)) == ["2023-02-20.png", "stored.png"]
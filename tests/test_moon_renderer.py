@@ -0,0 +1,75 @@
+import datetime
+import pickle
+from io import BytesIO
+
+import pytest
+from numpy import ndarray
+from PIL import Image
+
+from repos.repo_types import MoonPhase
+from utils.moon_renderer import moon_phase, render_disc, render_bucket, MoonRenderer
+
+
+@pytest.mark.parametrize(
+    "date, illumination, waxing",
+    [
+        (datetime.date(2023, 2, 5), 1.0, None),  # full moon 18:28 UTC
+        (datetime.date(2023, 2, 20), 0.0, None),  # new moon 07:06 UTC
+        (datetime.date(2023, 2, 27), 0.5, True),  # first quarter 08:06 UTC
+        (datetime.date(2023, 3, 15), 0.5, False),  # last quarter 02:08 UTC
+    ],
+)
+def test_moon_phase(date: datetime.date, illumination: float, waxing: bool) -> None:
+    """Test if phase is close to published lunar phases"""
+
+    phase: MoonPhase = moon_phase(date)
+
+    assert phase.illumination == pytest.approx(illumination, abs=0.06)
+    if waxing is not None:
+        assert (phase.elongation < 180) is waxing
+    assert abs(phase.libration_long) < 8.5
+    assert abs(phase.libration_lat) < 7
+
+
+def test_render_disc_lights_sun_side() -> None:
+    """Test if waxing Moon is lit on the right and new Moon is dark"""
+
+    first_quarter: ndarray = render_disc(90, 0, 0, 64)
+    new_moon: ndarray = render_disc(0, 0, 0, 64)
+
+    assert first_quarter.shape == (64, 64)
+    assert first_quarter[:, 32:].mean() > 10 * first_quarter[:, :32].mean()
+    assert new_moon.max() < 20
+    assert first_quarter[0, 0] == 0  # outside of the disc
+
+
+def test_moon_renderer_caches_by_bucket() -> None:
+    """Test if dates in the same phase bucket are rendered once"""
+
+    render_bucket.cache_clear()
+    renderer: MoonRenderer = MoonRenderer(size=32, phase_step=360, libration_step=90)
+
+    first: bytes = renderer.render(datetime.date(2023, 2, 5))
+    second: bytes = renderer.render(datetime.date(2023, 2, 6))
+
+    assert first == second
+    assert renderer.cache_hits == 1
+    assert Image.open(BytesIO(first)).size == (32, 32)
+
+    # jobs of "process" image executor are pickled
+    assert (
+        pickle.loads(pickle.dumps(renderer.render))(datetime.date(2023, 2, 5)) == first
+    )
+
+
+def test_moon_renderer_default_buckets_are_shared() -> None:
+    """Test if default steps let most dates of a year reuse a render"""
+
+    render_bucket.cache_clear()
+    renderer: MoonRenderer = MoonRenderer(size=16)
+    start: datetime.date = datetime.date(2023, 1, 1)
+
+    for day in range(365):
+        renderer.render(start + datetime.timedelta(days=day))
+
+    assert renderer.cache_hits >= 365 // 2
@@ -0,0 +1,35 @@
+import pytest
+
+from repos.parsers import parse_mgram_id, parse_grid_points
+from repos.repo_types import Coords2Points
+from utils.exceptions import ICMParserException
+
+
+def test_parse_mgram_id(city_result_template: str) -> None:
+    """Test meteogram id from search page. First show_mgram link wins"""
+
+    assert parse_mgram_id(city_result_template.encode("iso-8859-2")) == 1445
+
+
+def test_parse_mgram_id_not_found(city_result_template_no_res: str) -> None:
+    """Test search page without results"""
+
+    assert parse_mgram_id(city_result_template_no_res.encode("iso-8859-2")) is None
+
+
+def test_parse_grid_points(city_response: str) -> None:
+    """Test grid points from meteogram page"""
+
+    res: Coords2Points = parse_grid_points(city_response.encode("iso-8859-2"))
+
+    assert res == Coords2Points(act_x=222, act_y=352)
+
+
+def test_parsers_unknown_layout() -> None:
+    """Test if unknown page raises parser error instead of "not found" result"""
+
+    with pytest.raises(ICMParserException):
+        parse_mgram_id(b"<html><body>maintenance</body></html>")
+
+    with pytest.raises(ICMParserException):
+        parse_grid_points(b"<script>var act_x = 1;</script>")
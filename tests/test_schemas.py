@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from PIL import Image
+
+from repos.repo_types import UmMeteoGram
+from repos.schemas import FileField, ImageProxy
+from tests.tests_utils import create_images
+
+
+def test_file_field_returns_lazy_proxy(tmp_path) -> None:
+    """Test if path from database becomes proxy and nothing is decoded upfront"""
+
+    images: UmMeteoGram = create_images(str(tmp_path))
+    field: FileField = FileField(upload_to=str(tmp_path / "moon"))
+
+    proxy: ImageProxy = field.to_python_value(images.base_img.url)
+
+    assert isinstance(proxy, ImageProxy)
+    assert proxy.url == images.base_img.url
+    assert proxy.size == (300, 100)
+    assert proxy.file_size == os.path.getsize(images.base_img.url)
+    assert proxy._image is None
+    assert field.to_db_value(proxy, None) == images.base_img.url
+
+
+def test_image_proxy_open_and_close(tmp_path) -> None:
+    """Test if image is decoded once on open and released on close"""
+
+    images: UmMeteoGram = create_images(str(tmp_path))
+    proxy: ImageProxy = ImageProxy(images.extra_img.url)
+
+    with proxy as img:
+        assert isinstance(img, Image.Image)
+        assert proxy.open() is img
+        assert img.getpixel((0, 0)) == (255, 255, 255)
+
+    assert proxy._image is None
+
+
+@pytest.mark.asyncio
+async def test_image_proxy_load(tmp_path) -> None:
+    """Test if image can be decoded in image executor"""
+
+    images: UmMeteoGram = create_images(str(tmp_path))
+    proxy: ImageProxy = ImageProxy(images.extra_img.url)
+
+    img: Image.Image = await proxy.load()
+
+    assert img.size == (100, 100)
+    assert await proxy.load() is img
+    proxy.close()
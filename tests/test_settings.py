@@ -0,0 +1,71 @@
+import os
+import tempfile
+
+import numpy
+from numpy import ndarray
+
+from settings import load_matrix, MATRIX_SHAPE, Settings
+
+
+def test_load_matrix_memory_map(matrix: ndarray) -> None:
+    """Test if matrix is mapped read-only and loaded once per process"""
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        matrix_path: str = os.path.join(tmp_dir, "matrix.bin")
+        matrix.tofile(matrix_path)
+
+        res: ndarray = load_matrix(matrix_path)
+
+        assert isinstance(res, numpy.memmap)
+        assert res.shape == MATRIX_SHAPE
+        assert not res.flags.writeable
+        assert numpy.array_equal(res, matrix)
+        assert load_matrix(matrix_path) is res
+
+        compact: ndarray = load_matrix(matrix_path, compact=True)
+
+        assert compact.dtype == numpy.float32
+        assert os.path.isfile(f"{matrix_path}.f32")
+        assert numpy.allclose(compact, matrix, rtol=1e-6)
+
+        del res, compact
+        load_matrix.cache_clear()
+
+
+def test_load_matrix_no_file() -> None:
+    """Test missing .bin file"""
+
+    assert load_matrix(os.path.join(tempfile.gettempdir(), "not_existing.bin")) is None
+
+
+def test_settings_shared_instance() -> None:
+    """Test if every Settings() call returns the same object"""
+
+    assert Settings() is Settings()
+    assert Settings().db_config is Settings().db_config
+
+
+def test_settings_reload() -> None:
+    """Test if reload drops overridden values"""
+
+    settings: Settings = Settings()
+    media: str = settings.MEDIA
+    settings.set_setting("MEDIA", tempfile.gettempdir())
+    settings.MATRIX_RESHAPE = numpy.zeros(MATRIX_SHAPE)
+
+    reloaded: Settings = Settings.reload()
+
+    assert reloaded is settings
+    assert settings.MEDIA == media
+    assert settings.MATRIX_RESHAPE is None
+
+
+def test_moon_archive_path_follows_media() -> None:
+    """Test if archive path is resolved from MEDIA on first access"""
+
+    settings: Settings = Settings()
+    settings.set_setting("MEDIA", tempfile.gettempdir())
+
+    assert settings.MOON_ARCHIVE_PATH == os.path.join(
+        tempfile.gettempdir(), "moon.pack"
+    )
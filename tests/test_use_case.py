@@ -1,6 +1,7 @@
+import asyncio
 import datetime
 import os
-import tempfile
+from io import BytesIO
 from typing import Optional, Union, List, Tuple
 from unittest.mock import patch, Mock
 
@@ -10,14 +11,20 @@ from PIL import Image
 from numpy import array
 from pytest_mock import MockerFixture
 
+from repos.api_repo import APIRepo
+from repos.cache_repo import GridPointCache
+from repos.db_repo import MoonRepo
+from repos.http_client import HTTPClient
 from repos.models import Coords
+from repos.moon_archive import MoonArchive, ArchiveReader
 from repos.repo_types import Coords2Points, UmMeteoGram
 from tests.tests_utils import create_images
 import use_cases
 from use_cases.use_case import DiscordUseCase
 
 from settings import Settings
-from utils.utils import URLConfig
+from utils.executor import ImageExecutor
+from utils.utils import URLConfig, um_model_run
 
 
 def test_discord_use_case_search_index(
@@ -43,37 +50,24 @@ def test_discord_use_case_search_index(
         assert res.act_y == 31
 
 
-def test_merging_two_photos(
-    discord_use_case: DiscordUseCase, mocker: "MockerFixture"
-) -> None:
+def test_merging_two_photos(discord_use_case: DiscordUseCase, tmp_path) -> None:
     """Testing merging_two_photos method"""
 
-    mocker.patch("os.path.exists", return_value=True)
-    mocker.patch("urllib.request.urlretrieve", return_value="")
-
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        images: UmMeteoGram = create_images(tmp_dir)
-
-        root_path: str = images.base_img.url.split("utils")[0]
-
-        discord_use_case.settings.set_setting("ROOT_PATH", root_path)
-        discord_use_case.settings.set_setting("MEDIA", root_path)
+    images: UmMeteoGram = create_images(str(tmp_path))
 
-        res: str = discord_use_case.merging_two_photos(" ")
+    with open(images.extra_img.url, "rb") as f:
+        meteogram: bytes = f.read()
 
-        assert res
-
-        img: Image = Image.open(res)
-        expected_size = (
-            images.base_img.size[0] + images.extra_img.size[0],
-            images.base_img.size[1],
-        )
+    res: BytesIO = discord_use_case.merging_two_photos(images.base_img, meteogram)
 
-        assert img.size == expected_size
+    img: Image = Image.open(res)
+    expected_size = (
+        images.base_img.size[0] + images.extra_img.size[0],
+        images.base_img.size[1],
+    )
 
-        img.close()
-        images.base_img.close()
-        images.extra_img.close()
+    assert img.format == "PNG"
+    assert img.size == expected_size
 
 
 @pytest.mark.asyncio
@@ -84,7 +78,7 @@ async def test_icm_database_search_no_bin_file(
 
     with Settings() as settings:
         settings.MATRIX_RESHAPE = None
-        mocker.patch("repos.api_repo.APIRepo.get_icm_result", return_value=None)
+        mocker.patch("repos.api_repo.APIRepo.get_grid_points", return_value=None)
 
         res: Optional[str] = await discord_use_case.icm_database_search(
             city="City", coords=None
@@ -102,7 +96,7 @@ async def test_icm_database_search_no_url_no_cords(
     with Settings() as settings:
         settings.MATRIX_RESHAPE = matrix
 
-        mocker.patch("repos.api_repo.APIRepo.get_icm_result", return_value=None)
+        mocker.patch("repos.api_repo.APIRepo.get_grid_points", return_value=None)
 
         res: Optional[str] = await discord_use_case.icm_database_search(
             city="City", coords=None
@@ -113,47 +107,94 @@ async def test_icm_database_search_no_url_no_cords(
 
 @pytest.mark.asyncio
 async def test_icm_database_search_url(
-    discord_use_case: DiscordUseCase, mocker: "MockerFixture", matrix: numpy.ndarray
+    discord_use_case: DiscordUseCase,
+    mocker: "MockerFixture",
+    matrix: numpy.ndarray,
+    tmp_path,
 ) -> None:
-    """Test main method for generating image url. URL returned"""
+    """Test main method for generating meteogram. Grid points returned"""
 
     with Settings() as settings:
         settings.MATRIX_RESHAPE = matrix
+        settings.ROOT_PATH = str(tmp_path)
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            images: UmMeteoGram = create_images(tmp_dir)
+        images: UmMeteoGram = create_images(str(tmp_path))
+        points: Coords2Points = Coords2Points(act_x=200, act_y=100)
+        with open(images.extra_img.url, "rb") as f:
+            meteogram: bytes = f.read()
 
-        expected: str = URLConfig.MGRAM_URL.format(act_y="100", act_x="200", uuid="3")
-
-        mocker.patch("repos.api_repo.APIRepo.get_icm_result", return_value=expected)
-        mocker.patch(
-            "use_cases.use_case.DiscordUseCase.merging_two_photos",
-            return_value=images.base_img.url,
+        mocker.patch("repos.api_repo.APIRepo.get_grid_points", return_value=points)
+        get_image = mocker.patch(
+            "repos.api_repo.APIRepo.get_image", return_value=meteogram
         )
 
-        res: Optional[str] = await discord_use_case.icm_database_search(
+        res: Optional[BytesIO] = await discord_use_case.icm_database_search(
             city="City", coords=None
         )
 
         assert res
-        assert res == images.base_img.url
+        assert Image.open(res).size == (400, 100)
+        assert "row=100&col=200" in get_image.call_args.args[0]
+        assert os.path.isfile(
+            discord_use_case.meteogram_cache.path(points, um_model_run())
+        )
+
+        res_cached: Optional[BytesIO] = await discord_use_case.icm_database_search(
+            city="City", coords=None
+        )
+
+        assert res_cached.getvalue() == res.getvalue()
+        assert get_image.call_count == 1
 
 
 @pytest.mark.asyncio
-async def test_icm_database_search_no_url_but_bin_file(
-    discord_use_case: DiscordUseCase, mocker: "MockerFixture", matrix: numpy.ndarray
+async def test_icm_database_search_coalesced(
+    discord_use_case: DiscordUseCase, mocker: "MockerFixture", tmp_path
 ) -> None:
-    """Test main method for generating image url. URL not returned"""
+    """Test if concurrent searches for the same city share one download and merge"""
 
-    discord_use_case.settings.set_setting("MATRIX_RESHAPE", matrix)
-    with tempfile.TemporaryDirectory() as tmp_dir:
-        images: UmMeteoGram = create_images(tmp_dir)
+    discord_use_case.settings.set_setting("ROOT_PATH", str(tmp_path))
+    images: UmMeteoGram = create_images(str(tmp_path))
+    with open(images.extra_img.url, "rb") as f:
+        meteogram: bytes = f.read()
 
-    mocker.patch("repos.api_repo.APIRepo.get_icm_result", return_value=None)
     mocker.patch(
-        "use_cases.use_case.DiscordUseCase.merging_two_photos",
-        return_value=images.base_img.url,
+        "repos.api_repo.APIRepo.get_grid_points",
+        return_value=Coords2Points(act_x=200, act_y=100),
     )
+    get_image = mocker.patch("repos.api_repo.APIRepo.get_image", return_value=meteogram)
+    deduplicated: int = discord_use_case.single_flight.deduplicated["meteogram"]
+
+    results: List[BytesIO] = await asyncio.gather(
+        *(
+            discord_use_case.icm_database_search(city="City", coords=None)
+            for _ in range(3)
+        )
+    )
+
+    assert get_image.call_count == 1
+    assert len({id(res) for res in results}) == 3
+    assert len({res.getvalue() for res in results}) == 1
+    assert discord_use_case.single_flight.deduplicated["meteogram"] == deduplicated + 2
+
+
+@pytest.mark.asyncio
+async def test_icm_database_search_no_url_but_bin_file(
+    discord_use_case: DiscordUseCase,
+    mocker: "MockerFixture",
+    matrix: numpy.ndarray,
+    tmp_path,
+) -> None:
+    """Test main method for generating meteogram. Grid points not returned"""
+
+    discord_use_case.settings.set_setting("MATRIX_RESHAPE", matrix)
+    discord_use_case.settings.set_setting("ROOT_PATH", str(tmp_path))
+    images: UmMeteoGram = create_images(str(tmp_path))
+    with open(images.extra_img.url, "rb") as f:
+        meteogram: bytes = f.read()
+
+    mocker.patch("repos.api_repo.APIRepo.get_grid_points", return_value=None)
+    get_image = mocker.patch("repos.api_repo.APIRepo.get_image", return_value=meteogram)
 
     index_result: Coords2Points = Coords2Points(act_x=409, act_y=80)
     mocker.patch(
@@ -161,15 +202,39 @@ async def test_icm_database_search_no_url_but_bin_file(
         return_value=index_result,
     )
 
-    expected: str = URLConfig.MGRAM_URL.format(act_y="100", act_x="200", uuid="3")
+    expected: str = URLConfig.MGRAM_URL.format(act_y="100", act_x="200", model_run="3")
     mocker.patch("repos.api_repo.APIRepo.prepare_metagram_url", return_value=expected)
 
-    res: Optional[str] = await discord_use_case.icm_database_search(
+    res: Optional[BytesIO] = await discord_use_case.icm_database_search(
         city="City", coords=Coords(latitude=54.25, longitude=35.35)
     )
 
     assert res
-    assert res == images.base_img.url
+    assert discord_use_case.meteogram_cache.get(index_result, um_model_run())
+    get_image.assert_called_once_with(expected)
+
+
+@pytest.mark.asyncio
+async def test_get_legend_downloaded_once(
+    discord_use_case: DiscordUseCase, mocker: "MockerFixture", tmp_path
+) -> None:
+    """Test if missing legend is downloaded, saved and decoded once"""
+
+    discord_use_case.settings.set_setting("ROOT_PATH", str(tmp_path))
+    images: UmMeteoGram = create_images(str(tmp_path / "source"))
+    os.makedirs(tmp_path / "utils")
+    with open(images.base_img.url, "rb") as f:
+        legend: bytes = f.read()
+
+    get_image = mocker.patch("repos.api_repo.APIRepo.get_image", return_value=legend)
+
+    first: Image = await discord_use_case.get_legend()
+    second: Image = await discord_use_case.get_legend()
+
+    assert first is second
+    assert first.size == (300, 100)
+    assert os.path.isfile(tmp_path / "utils" / "base.png")
+    get_image.assert_called_once()
 
 
 @pytest.mark.asyncio
@@ -182,22 +247,33 @@ async def test_get_moon_img(
         def __init__(self, url):
             self.url: Optional[str] = url
 
-    class MoonModelTest:
-        def __init__(self, date: datetime, image: str):
-            self.date = date
-            self.image = ImageClassExample(url=image)
-
-    obj: MoonModelTest = MoonModelTest(
-        date=datetime.datetime.now(), image="example.jpg"
-    )
-    db_res: List[MoonModelTest] = [obj]
-
-    mocker.patch("repos.db_repo.MoonRepo.filter", return_value=db_res)
+    image: ImageClassExample = ImageClassExample(url="example.jpg")
+    mocker.patch("use_cases.use_case.ensure_db", return_value=True)
+    get_by_date = mocker.patch("repos.db_repo.MoonRepo.get_by_date", return_value=image)
 
     res: Union[str, dict] = await discord_use_case.get_moon_img("20.02.2023")
     assert res
     assert isinstance(res, str)
-    assert res == obj.image.url
+    assert res == image.url
+    get_by_date.assert_called_once_with(datetime.date(2023, 2, 20))
+
+
+@pytest.mark.asyncio
+async def test_get_moon_img_archived(
+    discord_use_case: DiscordUseCase, mocker: "MockerFixture", tmp_path
+) -> None:
+    """Test if archived moon image is served without database query"""
+
+    discord_use_case.moon_archive = MoonArchive(str(tmp_path / "moon.pack"))
+    discord_use_case.moon_archive.append(datetime.date(2023, 2, 20), b"PNG")
+    get_by_date = mocker.patch("repos.db_repo.MoonRepo.get_by_date")
+
+    res: Union[ArchiveReader, dict] = await discord_use_case.get_moon_img("20.02.2023")
+
+    assert isinstance(res, ArchiveReader)
+    assert res.read() == b"PNG"
+    get_by_date.assert_not_called()
+    discord_use_case.moon_archive.close()
 
 
 @pytest.mark.asyncio
@@ -216,7 +292,8 @@ async def test_get_moon_img_empty_res(
 ):
     """Test merging_two_photos method. No DB query"""
 
-    mocker.patch("repos.db_repo.MoonRepo.filter", return_value=[])
+    mocker.patch("use_cases.use_case.ensure_db", return_value=True)
+    mocker.patch("repos.db_repo.MoonRepo.get_by_date", return_value=None)
 
     res: Union[str, dict] = await discord_use_case.get_moon_img("20.02.2023")
     assert res
@@ -225,8 +302,32 @@ async def test_get_moon_img_empty_res(
 
 
 @pytest.mark.asyncio
-async def test_get_sat_url(discord_use_case: DiscordUseCase, mocker: "MockerFixture"):
+async def test_get_moon_img_database_down(
+    discord_use_case: DiscordUseCase, mocker: "MockerFixture"
+):
+    """Test if database which is not available gives the usual error message"""
+
+    ensure_db = mocker.patch("use_cases.use_case.ensure_db", return_value=False)
+    get_by_date = mocker.patch("repos.db_repo.MoonRepo.get_by_date")
+
+    res: Union[str, dict] = await discord_use_case.get_moon_img("20.02.2023")
+
+    assert res == {"error": "No moon data available for day 20.02.2023"}
+    ensure_db.assert_awaited_once()
+    get_by_date.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_sat_url(
+    discord_use_case: DiscordUseCase,
+    mocker: "MockerFixture",
+    http_responses: dict,
+    tmp_path,
+):
     """Test get_sat_url method"""
+    Settings().set_setting("MEDIA", str(tmp_path))
+    http_responses[("GET", URLConfig.SAT)] = b"GIF89a"
+    http_responses[("GET", URLConfig.SAT_INFRA)] = b"GIF89a"
     sunset: datetime = datetime.datetime.now()
     new_sunset: datetime = sunset.replace(hour=23)
 
@@ -255,3 +356,49 @@ async def test_get_sat_url(discord_use_case: DiscordUseCase, mocker: "MockerFixt
     assert res
     assert isinstance(res, str)
     assert expected_result == res
+
+
+@pytest.mark.asyncio
+async def test_warm_up_grid_points(
+    discord_use_case: DiscordUseCase, mocker: "MockerFixture"
+) -> None:
+    """Test grid point store warm-up. Stored cities are not scraped again"""
+
+    async def scrape(**kwargs) -> Optional[Coords2Points]:
+        if kwargs["data"]["name"] == "Nowhere":
+            return None
+        return Coords2Points(act_x=222, act_y=352)
+
+    scrape_mock = mocker.patch(
+        "repos.api_repo.APIRepo.scrape_grid_points", side_effect=scrape
+    )
+    discord_use_case.scrapper.grid_point_cache = GridPointCache()
+
+    res: dict = await discord_use_case.warm_up_grid_points(["Warszawa", "Nowhere", " "])
+    assert res == {"stored": 0, "found": 1, "not_found": 1, "failed": 0}
+
+    res = await discord_use_case.warm_up_grid_points(["warszawa", "NOWHERE"])
+    assert res == {"stored": 2, "found": 0, "not_found": 0, "failed": 0}
+    assert scrape_mock.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_use_case_shared_instances() -> None:
+    """Test if repo instances are reused and released on close"""
+
+    http_client: HTTPClient = HTTPClient()
+    scrapper: APIRepo = APIRepo(http_client=http_client)
+    executor: ImageExecutor = ImageExecutor(workers=1)
+    use_case: DiscordUseCase = DiscordUseCase(
+        db_repo=MoonRepo(), scrapper_repo=scrapper, image_executor=executor
+    )
+
+    assert use_case.scrapper is scrapper
+    assert isinstance(DiscordUseCase(scrapper_repo=APIRepo).scrapper, APIRepo)
+
+    session = http_client.session
+    await executor.run(sum, [1])
+    await use_case.close()
+
+    assert session.closed
+    assert executor._executor is None
@@ -1,7 +1,14 @@
 import datetime
 from types import GeneratorType
 
-from utils.utils import daterange, Validator, daterange_by_minutes
+from utils.utils import (
+    daterange,
+    Validator,
+    daterange_by_minutes,
+    normalize_city,
+    um_model_run,
+    plan_urls,
+)
 
 
 def test_date_range_func() -> None:
@@ -50,3 +57,39 @@ def test_validator_context_manager() -> None:
 
     with Validator(date.replace(".2023", ""), "Warszawa") as validator:
         assert "error" in validator
+
+
+def test_normalize_city() -> None:
+
+    assert normalize_city(" Kraków  Nowa Huta ") == "krakow nowa huta"
+    assert normalize_city("ŁÓDŹ") == "lodz"
+
+
+def test_um_model_run() -> None:
+    utc: datetime.timezone = datetime.timezone.utc
+
+    assert (
+        um_model_run(datetime.datetime(2023, 2, 19, 12, 0, tzinfo=utc)) == "2023021906"
+    )
+    assert (
+        um_model_run(datetime.datetime(2023, 2, 19, 10, 59, tzinfo=utc)) == "2023021900"
+    )
+    assert (
+        um_model_run(datetime.datetime(2023, 2, 19, 4, 0, tzinfo=utc)) == "2023021818"
+    )
+
+
+def test_plan_urls() -> None:
+    """Test if days are collapsed into unique pages"""
+
+    days: list = list(daterange(datetime.date(2023, 1, 30), datetime.date(2023, 3, 2)))
+
+    months: dict = plan_urls(days, "https://moon.pl/{year}/{month}")
+    daily: dict = plan_urls(days[:3], "https://moon.pl/{year}/{month}/{day}")
+
+    assert months == {
+        "https://moon.pl/2023/1": datetime.date(2023, 1, 30),
+        "https://moon.pl/2023/2": datetime.date(2023, 2, 1),
+        "https://moon.pl/2023/3": datetime.date(2023, 3, 1),
+    }
+    assert len(daily) == 3
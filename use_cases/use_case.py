@@ -1,36 +1,74 @@
+import asyncio
 import os
-import urllib.request
-from datetime import timedelta
 from datetime import datetime as dt
+from functools import lru_cache
+from io import BytesIO
 from types import GeneratorType
-from typing import Union, Optional, Type, List
+from typing import Union, Optional, Type, Iterable, Dict
 
+import aiohttp
 import numpy
 from PIL import Image
 from numpy import ndarray
 
 from logger import ColoredLogger, get_module_logger
 from repos.api_repo import APIRepo
+from repos.cache_repo import MeteogramCache
 from repos.db_repo import MoonRepo
-from repos.models import Coords, MoonModel
+from repos.models import Coords
+from repos.moon_archive import MoonArchive, ArchiveReader
 from repos.repo_types import Coords2Points
+from repos.schemas import ImageProxy
 from settings import Settings
 
 # settings: Settings = Settings()
-from utils.utils import daterange_by_minutes
+from utils.exceptions import ICMParserException
+from utils.async_utils import SingleFlight
+from utils.db_utils import ensure_db, DB_ERRORS
+from utils.executor import ImageExecutor
+from utils.grid_index import GridIndex
+from utils.utils import daterange_by_minutes, um_model_run
 
 logger: ColoredLogger = get_module_logger("USE_CASE")
 
 
+@lru_cache
+def load_legend(path: str) -> Image:
+    """Decoded meteogram legend. Read from disk once per path"""
+
+    legend: Image = Image.open(path)
+    legend.load()
+    return legend
+
+
 class DiscordUseCase:
     def __init__(
         self,
-        db_repo: Union[Type[MoonRepo]] = MoonRepo,
-        scrapper_repo: Union[Type[APIRepo]] = APIRepo,
+        db_repo: Union[MoonRepo, Type[MoonRepo]] = MoonRepo,
+        scrapper_repo: Union[APIRepo, Type[APIRepo]] = APIRepo,
+        meteogram_cache: Optional[MeteogramCache] = None,
+        image_executor: Optional[ImageExecutor] = None,
+        single_flight: Optional[SingleFlight] = None,
+        moon_archive: Optional[MoonArchive] = None,
     ):
-        self.db: MoonRepo = db_repo()
-        self.scrapper: APIRepo = scrapper_repo()
+        # repos may be shared instances (bot) or types instantiated per use case
+        self.db: MoonRepo = db_repo() if isinstance(db_repo, type) else db_repo
+        self.scrapper: APIRepo = (
+            scrapper_repo() if isinstance(scrapper_repo, type) else scrapper_repo
+        )
         self.settings = Settings()
+        self.meteogram_cache: MeteogramCache = (
+            meteogram_cache or MeteogramCache.shared()
+        )
+        self.image_executor: ImageExecutor = image_executor or ImageExecutor.shared()
+        self.single_flight: SingleFlight = single_flight or SingleFlight.shared()
+        self.moon_archive: MoonArchive = moon_archive or MoonArchive.shared()
+
+    async def close(self) -> None:
+        """Release HTTP connections, image workers and moon archive"""
+        await self.scrapper.close()
+        await asyncio.to_thread(self.image_executor.close)
+        self.moon_archive.close()
 
     async def get_coords(self, city: str) -> Optional[Coords]:
         coords: Union[Coords] = await self.scrapper.get_coords(city)
@@ -47,102 +85,172 @@ class DiscordUseCase:
     ) -> Coords2Points:
         """Search city points in meteo grid (.bin file)"""
 
-        longitude_arr: ndarray = array[:, :, 1] - long
-        latitude_arr: ndarray = array[:, :, 0] - lat
-        distance_between_points: ndarray = numpy.sqrt(
-            longitude_arr**2 + latitude_arr**2
-        )
-        array_with_distance_results: tuple = numpy.unravel_index(
-            numpy.argmin(distance_between_points), distance_between_points.shape
-        )
-        # new_coords = (
-        #     10 + round((array_with_distance_results[0] - 10) / 7) * 7,
-        #     10 + round((array_with_distance_results[1] - 10) / 7) * 7,
-        # )
-        act_x: int = 10 + round((array_with_distance_results[1] - 10) / 7) * 7
-        act_y: int = 10 + round((array_with_distance_results[0] - 10) / 7) * 7
+        row: int
+        column: int
+        row, column = GridIndex.for_array(array).nearest(lat=lat, long=long)
+
+        act_x: int = 10 + round((column - 10) / 7) * 7
+        act_y: int = 10 + round((row - 10) / 7) * 7
         logger.info(
             f"Method: searching_index_in_file, points from file found: {act_x, act_y}"
         )
 
         return Coords2Points(act_x=act_x, act_y=act_y)
 
-    def merging_two_photos(self, url) -> str:
-        """Merge two meteo photos. Base img and meteogram"""
+    async def get_legend(self) -> Image:
+        """Meteogram legend (base photo). Downloaded when missing, decoded once"""
 
-        utils_base_photo: str = os.path.join("utils", "base.png")
-        base_photo: str = os.path.join(self.settings.ROOT_PATH, utils_base_photo)
+        base_photo: str = os.path.join(self.settings.ROOT_PATH, "utils", "base.png")
 
         if not os.path.exists(base_photo):
-            urllib.request.urlretrieve(
-                self.settings.METEO_BASE_PHOTO_URL, utils_base_photo
+            content: bytes = await self.scrapper.get_image(
+                self.settings.METEO_BASE_PHOTO_URL
             )
+            await asyncio.to_thread(APIRepo.save_file, base_photo, content)
 
-        save_name: str = os.path.join(self.settings.ROOT_PATH, "my_image.png")
-        urllib.request.urlretrieve(url, save_name)
-        logger.info(f"Parsing url: {url}")
+        return await self.image_executor.run(load_legend, base_photo)
 
-        image1: Image = Image.open(os.path.join(self.settings.ROOT_PATH, base_photo))
-        image2: Image = Image.open(save_name)
+    @staticmethod
+    def merging_two_photos(legend: Image, meteogram: bytes) -> BytesIO:
+        """Merge two meteo photos. Base img and meteogram. Returns PNG buffer"""
 
-        image1_width: int
-        image1_height: int
-        image2_width: int
-        image2_height: int
+        image: Image = Image.open(BytesIO(meteogram))
 
-        image1_width, image1_height = image1.size
-        image2_width, image2_height = image2.size
+        legend_width: int
+        legend_height: int
+        image_width: int
 
-        new_image: Image = Image.new(
-            "RGB", (image1_width + image2_width, image1_height)
-        )
-        new_image.paste(image1, (0, 0))
-        new_image.paste(image2, (image1_width, 0))
-        new_path: str = os.path.join(self.settings.MEDIA, "merged_image.jpg")
-        new_image.save(new_path, "png")
+        legend_width, legend_height = legend.size
+        image_width = image.size[0]
 
-        os.remove(save_name)
+        new_image: Image = Image.new("RGB", (legend_width + image_width, legend_height))
+        new_image.paste(legend, (0, 0))
+        new_image.paste(image, (legend_width, 0))
 
-        return new_path
+        buffer: BytesIO = BytesIO()
+        new_image.save(buffer, "png")
+        buffer.seek(0)
+        return buffer
 
     async def icm_database_search(
         self, city: str, coords: Optional[Coords]
-    ) -> Optional[str]:
-        """Search city points. Firstly trying to get it from meteo "API", later from bin file"""
-        url: str = await self.scrapper.get_icm_result(data={"name": city})
-        logger.info(f"Method icm_database_search, url: {url}")
+    ) -> Optional[BytesIO]:
+        """
+        Search city points. Firstly trying to get it from meteo "API", later from bin file.
+        Returns merged meteogram as PNG buffer
+        """
+        coords2points: Optional[Coords2Points] = await self.scrapper.get_grid_points(
+            city
+        )
+        logger.info(f"Method icm_database_search, ICM points: {coords2points}")
 
-        if not url and not isinstance(self.settings.MATRIX_RESHAPE, numpy.ndarray):
+        if not coords2points and not isinstance(
+            self.settings.MATRIX_RESHAPE, numpy.ndarray
+        ):
             logger.info(f"Matrix is None. Cannot obtain city {city} data")
             return
 
-        if not url and not coords:
+        if not coords2points and not coords:
             logger.info(f"Url and coords are None. Cannot obtain city {city} data")
             return
 
-        if not url:
-            coords2points: Coords2Points = self.searching_index_in_file(
+        if not coords2points:
+            coords2points = self.searching_index_in_file(
                 coords.latitude, coords.longitude, self.settings.MATRIX_RESHAPE
             )
-            url: str = self.scrapper.prepare_metagram_url(coords2points)
-            logger.info(f"Url not found, preparing from file: {url}")
+            logger.info(f"ICM points not found, prepared from file: {coords2points}")
+
+        model_run: str = um_model_run()
+        cached: Optional[bytes] = await asyncio.to_thread(
+            self.meteogram_cache.get, coords2points, model_run
+        )
+        if cached:
+            logger.info(f"Meteogram for model run {model_run} found in cache")
+            return BytesIO(cached)
 
-        path_of_new_file: str = self.merging_two_photos(url=url)
-        return path_of_new_file
+        # concurrent commands for the same grid point share one download and merge
+        meteogram: bytes = await self.single_flight.do(
+            "meteogram",
+            (coords2points, model_run),
+            self.build_meteogram,
+            coords2points,
+            model_run,
+        )
+        return BytesIO(meteogram)
+
+    async def build_meteogram(
+        self, coords2points: Coords2Points, model_run: str
+    ) -> bytes:
+        """Download meteogram, merge it with legend and store it in cache"""
+
+        url: str = self.scrapper.prepare_metagram_url(
+            coords2points, model_run=model_run
+        )
+        logger.info(f"Parsing url: {url}")
+        legend: Image = await self.get_legend()
+        meteogram: bytes = await self.scrapper.get_image(url)
+
+        merged: BytesIO = await self.image_executor.run(
+            self.merging_two_photos, legend, meteogram
+        )
+        await asyncio.to_thread(
+            self.meteogram_cache.put, coords2points, model_run, merged.getvalue()
+        )
+        return merged.getvalue()
 
-    async def get_moon_img(self, date_str: str) -> Union[str, dict]:
+    async def warm_up_grid_points(
+        self, cities: Iterable[str], concurrency: int = 2
+    ) -> Dict[str, int]:
+        """Fill grid point store for given cities. Returns summary of the run"""
+
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        summary: Dict[str, int] = {"stored": 0, "found": 0, "not_found": 0, "failed": 0}
+
+        async def warm_up(city: str) -> None:
+            async with semaphore:
+                if await self.scrapper.grid_point_cache.get(city):
+                    summary["stored"] += 1
+                    return
+                try:
+                    points: Optional[Coords2Points] = (
+                        await self.scrapper.get_grid_points(city)
+                    )
+                except (
+                    aiohttp.ClientError,
+                    asyncio.TimeoutError,
+                    ICMParserException,
+                ) as err:
+                    logger.error(f"Grid points for city {city} not fetched: {err}")
+                    summary["failed"] += 1
+                    return
+                summary["found" if points else "not_found"] += 1
+
+        await asyncio.gather(*(warm_up(city) for city in cities if city.strip()))
+        logger.info(f"Method warm_up_grid_points, summary: {summary}")
+        return summary
+
+    async def get_moon_img(self, date_str: str) -> Union[str, ArchiveReader, dict]:
+        """Moon image from packed archive, image path from database as fallback"""
         day, month, year = date_str.split(".")
         try:
             date_obj: dt = dt(int(year), int(month), int(day), 0, 0, 0)
         except ValueError as err:
             logger.error(err)
             return {"error": "Day or month is out of range"}
-        res: List[MoonModel] = await self.db.filter(
-            date__gte=date_obj, date__lt=date_obj + timedelta(days=1)
-        )
 
-        if res:
-            return res[0].image.url
+        archived: Optional[ArchiveReader] = self.moon_archive.open(date_obj.date())
+        if archived:
+            return archived
+
+        image: Optional[ImageProxy] = None
+        if await ensure_db():
+            try:
+                image = await self.db.get_by_date(date_obj.date())
+            except DB_ERRORS as err:
+                logger.error(f"Moon image for {date_str} not read from database: {err}")
+
+        if image:
+            return image.url
         return {"error": f"No moon data available for day {date_str}"}
 
     async def get_sat_url(self):
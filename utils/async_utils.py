@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import Counter
+from collections.abc import AsyncIterable
+from typing import (
+    Optional,
+    Dict,
+    Hashable,
+    Tuple,
+    Callable,
+    Awaitable,
+    Any,
+    Iterable,
+    AsyncIterator,
+    List,
+    Union,
+)
+
+
+class AsyncRateLimiter:
+    """
+    Allows `rate` entries per `period` seconds. Entries over the limit wait for their slot.
+    Usage:
+        async with limiter:
+            await call()
+    """
+
+    def __init__(self, rate: int = 1, period: float = 1.0) -> None:
+        self.interval: float = period / rate
+        self._next_slot: float = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            now: float = time.monotonic()
+            delay: float = self._next_slot - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_slot = max(now, self._next_slot) + self.interval
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls. First call for a key runs, calls with
+    the same key made before it finishes wait for its result instead of repeating it.
+    Usage:
+        coords = await single_flight.do("get_coords", city, fetch_coords, city)
+    """
+
+    _shared: Optional["SingleFlight"] = None
+
+    def __init__(self) -> None:
+        self._calls: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self.calls: Counter = Counter()
+        self.deduplicated: Counter = Counter()
+
+    @classmethod
+    def shared(cls) -> "SingleFlight":
+        """Process-wide instance, so calls are coalesced across commands"""
+
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    async def do(
+        self, name: str, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs
+    ) -> Any:
+        call_key: Tuple[str, Hashable] = (name, key)
+        future: Optional[asyncio.Future] = self._calls.get(call_key)
+
+        if future is None:
+            self.calls[name] += 1
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[call_key] = future
+            future.add_done_callback(lambda _: self._calls.pop(call_key, None))
+        else:
+            self.deduplicated[name] += 1
+
+        # cancelling one waiter does not cancel the call shared with others
+        return await asyncio.shield(future)
+
+
+async def abatch(
+    items: Union[Iterable[Any], AsyncIterable], size: int
+) -> AsyncIterator[List[Any]]:
+    """
+    Groups items of (async) iterable into lists of `size`, last one may be shorter.
+    Usage:
+        async for batch in abatch(records, 100):
+            await flush(batch)
+    """
+
+    batch: List[Any] = []
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    else:
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+async def drain(queue: asyncio.Queue) -> AsyncIterator[Any]:
+    """Yields items put into queue until None is put"""
+
+    while (item := await queue.get()) is not None:
+        yield item
@@ -0,0 +1,85 @@
+import datetime
+import time
+from typing import Optional
+
+from logger import ColoredLogger, get_module_logger
+from repos.db_repo import CheckpointRepo
+from repos.models import BackfillCheckpointModel
+from settings import Settings
+
+settings: Settings = Settings()
+
+logger: ColoredLogger = get_module_logger("BACKFILL")
+
+
+class BackfillProgress:
+    """
+    Progress of a backfill job. Every finished date is saved to checkpoint table,
+    done/total with rate and ETA is logged every `log_every` dates.
+    Usage:
+        progress = BackfillProgress("moon_days", total=len(missing))
+        await progress.start()
+        ...
+        await progress.advance(day)
+    """
+
+    def __init__(
+        self,
+        job: str,
+        total: int,
+        checkpoints: Optional[CheckpointRepo] = None,
+        log_every: Optional[int] = None,
+    ) -> None:
+        self.job: str = job
+        self.total: int = total
+        self.checkpoints: CheckpointRepo = checkpoints or CheckpointRepo()
+        self.log_every: int = log_every or settings.BACKFILL_LOG_EVERY
+        self.done: int = 0
+        self.started: float = time.monotonic()
+
+    async def start(self) -> Optional[BackfillCheckpointModel]:
+        """Log previous run of the job. Returns its checkpoint"""
+
+        checkpoint: Optional[BackfillCheckpointModel] = await self.checkpoints.get(
+            self.job
+        )
+        if checkpoint is not None:
+            logger.info(
+                f"Resuming {self.job}, previous run did {checkpoint.done}/"
+                f"{checkpoint.total}, last date {checkpoint.last_date}"
+            )
+        logger.info(f"{self.job}: {self.total} dates to do")
+        self.started = time.monotonic()
+        return checkpoint
+
+    @property
+    def rate(self) -> float:
+        """Dates per second"""
+        elapsed: float = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds until all dates are done, None until rate is known"""
+        if not self.rate:
+            return None
+        return (self.total - self.done) / self.rate
+
+    async def advance(self, date: datetime.date, count: int = 1) -> None:
+        """Mark `count` dates as done, `date` is the last of them"""
+        previous: int = self.done
+        self.done += count
+        await self.checkpoints.save(self.job, date, self.done, self.total)
+
+        same_step: bool = self.done // self.log_every == previous // self.log_every
+        if same_step and self.done != self.total:
+            return
+        eta: str = (
+            "unknown"
+            if self.eta is None
+            else str(datetime.timedelta(seconds=round(self.eta)))
+        )
+        logger.info(
+            f"{self.job}: {self.done}/{self.total} "
+            f"({self.done / self.total:.0%}), {self.rate:.2f}/s, ETA {eta}"
+        )
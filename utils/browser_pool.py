@@ -0,0 +1,158 @@
+import asyncio
+from typing import Optional, Callable, Any, Dict, List, Tuple, Iterable, Awaitable
+
+from selenium.common import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from logger import ColoredLogger, get_module_logger
+from settings import Settings
+from utils.utils import start_driver  # type: ignore
+
+settings: Settings = Settings()
+
+logger: ColoredLogger = get_module_logger("BROWSER")
+
+# errors after which page is retried with a fresh driver
+PAGE_ERRORS: tuple = (WebDriverException, OSError)
+
+
+class BrowserPool:
+    """
+    Pool of WebDrivers fed from one async work queue. Every worker owns a driver and
+    runs blocking Selenium jobs in a thread. Driver is replaced after `pages_per_driver`
+    pages or after failed page, failed items are queued again up to `retries` times.
+    Usage:
+        async with BrowserPool(size=4) as pool:
+            failed = await pool.run(dates, scrape, save)
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        pages_per_driver: Optional[int] = None,
+        retries: Optional[int] = None,
+        factory: Optional[Callable[[], WebDriver]] = None,
+    ) -> None:
+        self.size: int = size or settings.BROWSER_POOL_SIZE
+        self.pages_per_driver: int = (
+            pages_per_driver or settings.BROWSER_PAGES_PER_DRIVER
+        )
+        self.retries: int = settings.BROWSER_RETRIES if retries is None else retries
+        self.factory: Callable[[], WebDriver] = factory or start_driver
+
+        self.metrics: Dict[str, int] = {
+            "pages": 0,
+            "failed_pages": 0,
+            "retried": 0,
+            "failed": 0,
+            "drivers_started": 0,
+            "drivers_recycled": 0,
+        }
+        self._idle: List[Tuple[WebDriver, int]] = []  # (driver, pages loaded)
+
+    async def __aenter__(self) -> "BrowserPool":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    async def _start(self) -> WebDriver:
+        driver: WebDriver = await asyncio.to_thread(self.factory)
+        self.metrics["drivers_started"] += 1
+        return driver
+
+    @staticmethod
+    async def _quit(driver: WebDriver) -> None:
+        try:
+            await asyncio.to_thread(driver.quit)
+        except WebDriverException:
+            pass  # driver is already gone
+
+    async def _acquire(self) -> Tuple[WebDriver, int]:
+        if self._idle:
+            return self._idle.pop()
+        return await self._start(), 0
+
+    async def _release(self, driver: WebDriver, pages: int) -> None:
+        """Keep driver for next run, worn out or failed driver is quit"""
+        if pages < self.pages_per_driver:
+            self._idle.append((driver, pages))
+            return
+        await self._quit(driver)
+        self.metrics["drivers_recycled"] += 1
+
+    async def _worker(
+        self,
+        queue: asyncio.Queue,
+        job: Callable[[WebDriver, Any], Any],
+        on_result: Optional[Callable[[Any, Any], Awaitable[None]]],
+        failed: List[Any],
+    ) -> None:
+        driver: Optional[WebDriver] = None
+        pages: int = 0
+        try:
+            while not queue.empty():
+                item, attempt = queue.get_nowait()
+
+                if driver is None:
+                    driver, pages = await self._acquire()
+                if pages >= self.pages_per_driver:
+                    await self._quit(driver)
+                    driver = None
+                    self.metrics["drivers_recycled"] += 1
+                    driver, pages = await self._start(), 0
+
+                try:
+                    result: Any = await asyncio.to_thread(job, driver, item)
+                except PAGE_ERRORS as error:
+                    self.metrics["failed_pages"] += 1
+                    pages = self.pages_per_driver  # driver may be broken, replace it
+                    if attempt < self.retries:
+                        self.metrics["retried"] += 1
+                        queue.put_nowait((item, attempt + 1))
+                        logger.warning(f"Retrying {item}: {error!r}")
+                    else:
+                        self.metrics["failed"] += 1
+                        failed.append(item)
+                        logger.error(f"Giving up {item}: {error!r}")
+                    continue
+
+                pages += 1
+                self.metrics["pages"] += 1
+                if on_result is not None:
+                    await on_result(item, result)
+        finally:
+            if driver is not None:
+                await self._release(driver, pages)
+
+    async def run(
+        self,
+        items: Iterable[Any],
+        job: Callable[[WebDriver, Any], Any],
+        on_result: Optional[Callable[[Any, Any], Awaitable[None]]] = None,
+    ) -> List[Any]:
+        """
+        Run job(driver, item) for every item on up to `size` drivers and await
+        on_result(item, result) for successful ones. Returns items which failed.
+        """
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait((item, 0))
+
+        failed: List[Any] = []
+        workers: List[asyncio.Task] = [
+            asyncio.create_task(self._worker(queue, job, on_result, failed))
+            for _ in range(min(self.size, queue.qsize()))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return failed
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        await asyncio.gather(*(self._quit(driver) for driver, _ in idle))
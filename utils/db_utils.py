@@ -1,37 +1,160 @@
 import asyncio
+import random
+import time
 from asyncio import AbstractEventLoop
 from datetime import datetime
-from time import sleep
+from typing import Optional
 
-from asyncpg import CannotConnectNowError
-from tortoise import Tortoise
+from asyncpg import PostgresError
+from tortoise import Tortoise, connections
+from tortoise.exceptions import BaseORMException
 
+from logger import ColoredLogger, get_module_logger
 from settings import Settings
 from utils.exceptions import DBConnectionError
 
 settings: Settings = Settings()
+logger: ColoredLogger = get_module_logger("DB")
+
+
+# database errors surfaced to callers which can work without database
+DB_ERRORS: tuple = (BaseORMException, PostgresError, OSError)
+
+# set by init_db, reset by close_db (Tortoise has no public flag for it)
+_initialized: bool = False
+_init_lock: asyncio.Lock = asyncio.Lock()
+
+
+def db_initialized() -> bool:
+    """True if init_db was done in this process (connections are opened on demand)"""
+    return _initialized
+
+
+async def init_db(
+    generate_schemas: bool = False, wait_timeout: Optional[float] = None
+) -> None:
+    """
+    Initialize Tortoise once per process and wait until database is ready
+    (DB_WAIT_TIMEOUT or `wait_timeout` seconds).
+    Connection pool size is set by DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE. Schema is created
+    by aerich migrations, generate_schemas is meant for tests and local tools only.
+    """
+    global _initialized
+    if not db_initialized():
+        await Tortoise.init(config=settings.db_config)
+        try:
+            await wait_for_db(timeout=wait_timeout)
+        except DBConnectionError:
+            await close_db()  # do not keep pool of a database which is not there
+            raise
+        _initialized = True
+
+    if generate_schemas:
+        await Tortoise.generate_schemas()
+
+
+async def ensure_db() -> bool:
+    """
+    True if database can be used. When it was not ready at startup, init_db is tried
+    again with short DB_RETRY_TIMEOUT, so the bot recovers without a restart.
+    """
+    if db_initialized():
+        return True
+    async with _init_lock:
+        if not db_initialized():
+            try:
+                await init_db(wait_timeout=settings.DB_RETRY_TIMEOUT)
+            except DBConnectionError:
+                return False
+    return True
+
+
+async def wait_for_db(
+    timeout: Optional[float] = None,
+    base_delay: Optional[float] = None,
+    max_delay: Optional[float] = None,
+) -> None:
+    """
+    Wait until database accepts queries (e.g. Postgres still starting under docker-compose).
+    Retries with jittered exponential backoff, raises DBConnectionError after timeout.
+    """
+    timeout = settings.DB_WAIT_TIMEOUT if timeout is None else timeout
+    base_delay = base_delay or settings.DB_WAIT_BASE_DELAY
+    max_delay = max_delay or settings.DB_WAIT_MAX_DELAY
+
+    started: float = time.monotonic()
+    attempt: int = 0
+    while True:
+        attempt += 1
+        try:
+            # one connect may hang much longer than timeout (e.g. dropped packets)
+            await asyncio.wait_for(
+                connections.get("default").execute_query("SELECT 1"),
+                max(timeout - (time.monotonic() - started), 0),
+            )
+        except (asyncio.TimeoutError, *DB_ERRORS) as err:
+            elapsed: float = time.monotonic() - started
+            if elapsed >= timeout:
+                logger.error(
+                    f"Database not ready: attempt={attempt} elapsed={elapsed:.2f}s "
+                    f"error={err!r}, giving up"
+                )
+                raise DBConnectionError() from err
+
+            # full jitter: random delay up to the exponential step, never past deadline
+            step: float = min(max_delay, base_delay * 2 ** (attempt - 1))
+            delay: float = min(random.uniform(0, step), timeout - elapsed)
+            logger.warning(
+                f"Database not ready: attempt={attempt} elapsed={elapsed:.2f}s "
+                f"retry_in={delay:.2f}s error={err!r}"
+            )
+            await asyncio.sleep(delay)
+        else:
+            logger.info(
+                f"Database ready: attempt={attempt} "
+                f"elapsed={time.monotonic() - started:.2f}s"
+            )
+            return
+
+
+async def close_db() -> None:
+    """Close connection pool. Next init_db opens a new one"""
+    global _initialized
+    await connections.close_all(discard=True)
+    _initialized = False
+
+
+async def db_health_check() -> bool:
+    """True if database answers a trivial query"""
+    if not db_initialized():
+        return False
+    try:
+        await connections.get("default").execute_query("SELECT 1")
+    except DB_ERRORS as err:
+        logger.error(f"Database health check failed: {err}")
+        return False
+    return True
 
 
 class DBConnectionHandler:
-    """Handler responsible for connection and disconnection to database"""
+    """
+    Handler responsible for connection and disconnection to database.
+    Reuses connections opened by init_db (bot) and closes only connections it opened.
+    """
+
+    def __init__(self, generate_schemas: bool = False) -> None:
+        self.generate_schemas: bool = generate_schemas
+        self._opened: bool = False
 
     async def __aenter__(self) -> None:
         """Open database connection"""
-        await Tortoise.init(config=settings.db_config)
-        while True:
-            retry: int = 0
-            try:
-                if retry >= 5:
-                    raise DBConnectionError()
-                await Tortoise.generate_schemas()
-                break
-            except (ConnectionError, CannotConnectNowError):
-                retry += 1
-                pass
+        self._opened = not db_initialized()
+        await init_db(generate_schemas=self.generate_schemas)
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
         """Close database connection"""
-        await Tortoise.close_connections()
+        if self._opened:
+            await close_db()
 
 
 #
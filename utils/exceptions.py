@@ -27,3 +27,11 @@ class NoImageFoundException(Exception):
 
 class UploadToNotGivenException(Exception):
     default_message = "Parameter upload_to not given. Be sure you used it in FileField field"
+
+
+class ICMParserException(CustomBaseException):
+    default_message = "ICM page could not be parsed. Page layout may have changed"
+
+
+class ExecutorQueueFullException(CustomBaseException):
+    default_message = "Image executor queue is full. Try again later"
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from asyncio import AbstractEventLoop
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Callable, Any, Dict
+
+from settings import Settings
+from utils.exceptions import ExecutorQueueFullException
+
+settings: Settings = Settings()
+
+EXECUTORS: Dict[str, type] = {
+    "thread": ThreadPoolExecutor,
+    "process": ProcessPoolExecutor,
+}
+
+
+class ImageExecutor:
+    """
+    Pool for CPU-bound image work (PIL decode, paste, crop, encode), so it does not
+    block the event loop. At most `workers` jobs are submitted to the pool, up to
+    `max_queue` more wait for a slot, next ones are rejected.
+    Usage:
+        image = await ImageExecutor.shared().run(Image.open, path)
+    Functions run in "process" pool must be picklable (module level).
+    """
+
+    _shared: Optional["ImageExecutor"] = None
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        kind: Optional[str] = None,
+    ) -> None:
+        self.workers: int = workers or settings.IMAGE_WORKERS
+        self.max_queue: int = (
+            settings.IMAGE_QUEUE_SIZE if max_queue is None else max_queue
+        )
+        self.kind: str = kind or settings.IMAGE_EXECUTOR
+        if self.kind not in EXECUTORS:
+            raise ValueError(f"Unknown executor kind: {self.kind}")
+
+        self.metrics: Dict[str, float] = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+        }
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[AbstractEventLoop] = None
+        self._waiting: int = 0
+
+    @classmethod
+    def shared(cls) -> "ImageExecutor":
+        """Process-wide executor used by image call sites"""
+
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = EXECUTORS[self.kind](max_workers=self.workers)
+        return self._executor
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        loop: AbstractEventLoop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._semaphore
+
+    @property
+    def queue_wait_avg(self) -> float:
+        if not self.metrics["submitted"]:
+            return 0.0
+        return self.metrics["queue_wait_total"] / self.metrics["submitted"]
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool and return its result"""
+
+        semaphore: asyncio.Semaphore = self.semaphore
+        if semaphore.locked() and self._waiting >= self.max_queue:
+            self.metrics["rejected"] += 1
+            raise ExecutorQueueFullException
+
+        queued_at: float = time.monotonic()
+        self._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            wait: float = time.monotonic() - queued_at
+            self.metrics["submitted"] += 1
+            self.metrics["queue_wait_total"] += wait
+            self.metrics["queue_wait_max"] = max(self.metrics["queue_wait_max"], wait)
+
+            result: Any = await self._loop.run_in_executor(
+                self.executor, partial(func, *args, **kwargs)
+            )
+            self.metrics["completed"] += 1
+            return result
+        finally:
+            semaphore.release()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._executor = None
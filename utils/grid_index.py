@@ -0,0 +1,143 @@
+import math
+import weakref
+from typing import Optional, Tuple, List
+
+import numpy
+from numpy import ndarray
+
+
+class GridIndex:
+    """
+    Bucketed spatial hash over meteo grid points (.bin file matrix).
+    Points are grouped by square buckets and lookups scan rings of buckets around
+    the query point, so only a few hundred points are compared instead of the
+    whole 616x448 grid. Result is the same as numpy.argmin over the full distance field
+    (ties resolved by the lowest flat index).
+    """
+
+    _cache: Optional[Tuple[weakref.ref, "GridIndex"]] = None
+
+    def __init__(self, array: ndarray, points_per_bucket: int = 4) -> None:
+        self.shape: Tuple[int, int] = array.shape[:2]
+        self._lat: ndarray = numpy.ascontiguousarray(array[:, :, 0]).ravel()
+        self._long: ndarray = numpy.ascontiguousarray(array[:, :, 1]).ravel()
+
+        self._lat_min: float = float(self._lat.min())
+        self._long_min: float = float(self._long.min())
+        lat_span: float = float(self._lat.max()) - self._lat_min
+        long_span: float = float(self._long.max()) - self._long_min
+
+        buckets: int = max(1, self._lat.size // points_per_bucket)
+        if lat_span > 0 and long_span > 0:
+            self._step: float = math.sqrt(lat_span * long_span / buckets)
+        else:
+            self._step = max(lat_span, long_span) / buckets or 1.0
+
+        self._rows: int = int(lat_span // self._step) + 1
+        self._cols: int = int(long_span // self._step) + 1
+        self._eps: float = self._step * 1e-9
+
+        rows: ndarray = self._bucket(self._lat, self._lat_min, self._rows)
+        cols: ndarray = self._bucket(self._long, self._long_min, self._cols)
+        keys: ndarray = rows * self._cols + cols
+
+        # flat indices sorted by bucket, ascending inside every bucket (stable sort)
+        self._order: ndarray = numpy.argsort(keys, kind="stable")
+        self._starts: ndarray = numpy.searchsorted(
+            keys[self._order], numpy.arange(self._rows * self._cols + 1)
+        )
+
+    @classmethod
+    def for_array(cls, array: ndarray) -> "GridIndex":
+        """Returns index for given matrix. Index is built once and reused for the same array"""
+
+        if cls._cache is not None:
+            array_ref, index = cls._cache
+            if array_ref() is array:
+                return index
+
+        index = cls(array)
+        cls._cache = (weakref.ref(array), index)
+        return index
+
+    def _bucket(self, values: ndarray, minimum: float, size: int) -> ndarray:
+        buckets: ndarray = numpy.floor((values - minimum) / self._step).astype(
+            numpy.int64
+        )
+        return numpy.clip(buckets, 0, size - 1)
+
+    def _ring(self, row: int, col: int, radius: int) -> List[Tuple[int, int]]:
+        """Ranges in self._order for buckets lying exactly `radius` rings away"""
+
+        col_from: int = max(col - radius, 0)
+        col_to: int = min(col + radius, self._cols - 1)
+        segments: List[Tuple[int, int]] = []
+
+        for ring_row in range(row - radius, row + radius + 1):
+            if not 0 <= ring_row < self._rows:
+                continue
+            key: int = ring_row * self._cols
+            if ring_row in (row - radius, row + radius):
+                segments.append((key + col_from, key + col_to + 1))
+                continue
+            for ring_col in (col - radius, col + radius):
+                if 0 <= ring_col < self._cols:
+                    segments.append((key + ring_col, key + ring_col + 1))
+
+        return [(self._starts[start], self._starts[stop]) for start, stop in segments]
+
+    def _lower_bound(
+        self, lat: float, long: float, row: int, col: int, radius: int
+    ) -> Optional[float]:
+        """Smallest possible distance to points in buckets not visited yet"""
+
+        gaps: List[float] = []
+        if row - radius > 0:
+            gaps.append(lat - (self._lat_min + (row - radius) * self._step))
+        if row + radius < self._rows - 1:
+            gaps.append(self._lat_min + (row + radius + 1) * self._step - lat)
+        if col - radius > 0:
+            gaps.append(long - (self._long_min + (col - radius) * self._step))
+        if col + radius < self._cols - 1:
+            gaps.append(self._long_min + (col + radius + 1) * self._step - long)
+
+        if not gaps:
+            return None
+        return max(min(gaps), 0.0) - self._eps
+
+    def nearest(self, lat: float, long: float) -> Tuple[int, int]:
+        """Returns (row, column) of the grid point closest to given coords"""
+
+        row: int = min(max(int((lat - self._lat_min) // self._step), 0), self._rows - 1)
+        col: int = min(
+            max(int((long - self._long_min) // self._step), 0), self._cols - 1
+        )
+
+        best_distance: float = math.inf
+        best_index: int = -1
+        radius: int = 0
+
+        while True:
+            segments: List[ndarray] = [
+                self._order[start:stop]
+                for start, stop in self._ring(row, col, radius)
+                if start != stop
+            ]
+            if segments:
+                indexes: ndarray = numpy.concatenate(segments)
+                distances: ndarray = numpy.sqrt(
+                    (self._long[indexes] - long) ** 2 + (self._lat[indexes] - lat) ** 2
+                )
+                distance: float = float(distances.min())
+                index: int = int(indexes[distances == distance].min())
+                if distance < best_distance or (
+                    distance == best_distance and index < best_index
+                ):
+                    best_distance, best_index = distance, index
+
+            bound: Optional[float] = self._lower_bound(lat, long, row, col, radius)
+            if bound is None or best_distance < bound:
+                break
+            radius += 1
+
+        return divmod(best_index, self.shape[1])
@@ -0,0 +1,271 @@
+import datetime
+import math
+from functools import lru_cache
+from io import BytesIO
+from typing import Optional, Tuple
+
+import numpy
+from numpy import ndarray
+from PIL import Image
+
+from repos.repo_types import MoonPhase
+from settings import Settings
+
+settings: Settings = Settings()
+
+J2000: float = 2451545.0
+SYNODIC_MONTH: float = 29.530588853  # days
+LUNAR_INCLINATION: float = math.radians(1.54242)  # lunar equator to ecliptic
+EARTHSHINE: float = 0.02
+ALBEDO_MAP_RESOLUTION: int = 4  # samples per degree of selenographic lat/long
+
+# (selenographic latitude, longitude, radius, darkening) of large maria, degrees
+MARIA: Tuple[Tuple[float, float, float, float], ...] = (
+    (18.0, -57.0, 30.0, 0.28),  # Oceanus Procellarum
+    (33.0, -16.0, 18.5, 0.36),  # Mare Imbrium
+    (28.0, 17.5, 11.0, 0.38),  # Mare Serenitatis
+    (8.5, 31.4, 13.5, 0.36),  # Mare Tranquillitatis
+    (17.0, 59.1, 9.0, 0.40),  # Mare Crisium
+    (-7.8, 51.3, 12.0, 0.32),  # Mare Fecunditatis
+    (-15.2, 35.5, 5.5, 0.32),  # Mare Nectaris
+    (-21.3, -16.6, 11.5, 0.28),  # Mare Nubium
+    (-24.4, -38.6, 6.5, 0.32),  # Mare Humorum
+    (56.0, 1.4, 10.0, 0.26),  # Mare Frigoris
+)
+
+
+def julian_day(date: datetime.date, hour: float = 12) -> float:
+    """Julian day of given date and UTC hour. Example: 2000-01-01 12:00 -> 2451545.0"""
+    return date.toordinal() + 1721424.5 + hour / 24
+
+
+def moon_phase(date: datetime.date) -> MoonPhase:
+    """
+    Geocentric Moon phase at 12:00 UTC of given date, low precision series from
+    Meeus "Astronomical Algorithms" (ch. 47-49, 53). Error is well under a degree.
+    Angles are in degrees, elongation grows from 0 (new moon) to 360.
+    """
+
+    t: float = (julian_day(date) - J2000) / 36525
+    elongation: float = math.radians(297.8501921 + 445267.1114034 * t)  # D
+    sun_anomaly: float = math.radians(357.5291092 + 35999.0502909 * t)  # M
+    moon_anomaly: float = math.radians(134.9633964 + 477198.8675055 * t)  # M'
+    latitude_argument: float = math.radians(93.2720950 + 483202.0175233 * t)  # F
+    mean_longitude: float = math.radians(218.3164477 + 481267.88123421 * t)  # L'
+    node: float = math.radians(125.0445479 - 1934.1362891 * t)  # Omega
+
+    phase_angle: float = (
+        180
+        - math.degrees(elongation)
+        - 6.289 * math.sin(moon_anomaly)
+        + 2.100 * math.sin(sun_anomaly)
+        - 1.274 * math.sin(2 * elongation - moon_anomaly)
+        - 0.658 * math.sin(2 * elongation)
+        - 0.214 * math.sin(2 * moon_anomaly)
+        - 0.110 * math.sin(elongation)
+    )
+    true_elongation: float = (180 - phase_angle) % 360
+
+    longitude: float = mean_longitude + math.radians(
+        6.289 * math.sin(moon_anomaly)
+        + 1.274 * math.sin(2 * elongation - moon_anomaly)
+        + 0.658 * math.sin(2 * elongation)
+        + 0.214 * math.sin(2 * moon_anomaly)
+        - 0.186 * math.sin(sun_anomaly)
+        - 0.114 * math.sin(2 * latitude_argument)
+    )
+    latitude: float = math.radians(
+        5.128 * math.sin(latitude_argument)
+        + 0.281 * math.sin(moon_anomaly + latitude_argument)
+        + 0.278 * math.sin(moon_anomaly - latitude_argument)
+        + 0.173 * math.sin(2 * elongation - latitude_argument)
+    )
+
+    # optical libration, Meeus (53.1)
+    w: float = longitude - node
+    a: float = math.atan2(
+        math.sin(w) * math.cos(latitude) * math.cos(LUNAR_INCLINATION)
+        - math.sin(latitude) * math.sin(LUNAR_INCLINATION),
+        math.cos(w) * math.cos(latitude),
+    )
+    libration_long: float = (math.degrees(a - latitude_argument) + 180) % 360 - 180
+    libration_lat: float = math.degrees(
+        math.asin(
+            -math.sin(w) * math.cos(latitude) * math.sin(LUNAR_INCLINATION)
+            - math.sin(latitude) * math.cos(LUNAR_INCLINATION)
+        )
+    )
+
+    return MoonPhase(
+        date=date,
+        elongation=true_elongation,
+        illumination=(1 + math.cos(math.radians(phase_angle))) / 2,
+        age=true_elongation / 360 * SYNODIC_MONTH,
+        libration_long=libration_long,
+        libration_lat=libration_lat,
+    )
+
+
+@lru_cache(maxsize=1)
+def albedo_map() -> ndarray:
+    """Equirectangular selenographic albedo (latitude rows from -90, long from -180)"""
+
+    lat, long = numpy.radians(
+        numpy.mgrid[
+            -90 : 90 : 180 * ALBEDO_MAP_RESOLUTION * 1j,
+            -180 : 180 : 360 * ALBEDO_MAP_RESOLUTION * 1j,
+        ]
+    )
+    albedo: ndarray = numpy.full(lat.shape, 0.75)
+    for mare_lat, mare_long, mare_radius, darkening in MARIA:
+        mare_lat, mare_long = math.radians(mare_lat), math.radians(mare_long)
+        distance: ndarray = numpy.arccos(
+            numpy.clip(
+                numpy.sin(lat) * math.sin(mare_lat)
+                + numpy.cos(lat) * math.cos(mare_lat) * numpy.cos(long - mare_long),
+                -1,
+                1,
+            )
+        )
+        albedo -= darkening * numpy.exp(-((distance / math.radians(mare_radius)) ** 2))
+    return albedo.astype(numpy.float32)
+
+
+def sample_albedo(surface: ndarray) -> ndarray:
+    """Albedo at selenographic unit vectors (3, N), nearest sample of albedo_map"""
+
+    texture: ndarray = albedo_map()
+    rows, columns = texture.shape
+    lat: ndarray = numpy.arcsin(numpy.clip(surface[1], -1, 1))
+    long: ndarray = numpy.arctan2(surface[0], surface[2])
+    row: ndarray = lat * numpy.float32((rows - 1) / math.pi) + (rows - 1) / 2
+    column: ndarray = (
+        long * numpy.float32((columns - 1) / (2 * math.pi)) + (columns - 1) / 2
+    )
+    index: ndarray = row.round().astype(numpy.intp) * columns
+    return numpy.take(texture, index + column.round().astype(numpy.intp))
+
+
+@lru_cache(maxsize=4)
+def disc_geometry(size: int) -> Tuple[ndarray, ...]:
+    """Pixels of the disc: (mask, x, y, z, limb anti-aliasing) for given image size"""
+
+    coords: ndarray = (numpy.arange(size, dtype=numpy.float32) + 0.5) / size * 2 - 1
+    x, y = numpy.meshgrid(coords, -coords)
+    radius: ndarray = numpy.sqrt(x * x + y * y)
+    inside: ndarray = radius < 1
+    x, y, radius = x[inside], y[inside], radius[inside]
+    z: ndarray = numpy.sqrt(1 - radius * radius)
+    edge: ndarray = numpy.clip((1 - radius) * size / 2, 0, 1)
+    return inside, x, y, z, edge
+
+
+def render_disc(
+    elongation: float, libration_long: float, libration_lat: float, size: int
+) -> ndarray:
+    """
+    Grayscale lunar disc (size x size, uint8) seen from Earth with north up.
+    Surface is lit with Lommel-Seeliger law, maria are rotated by libration.
+    Only pixels inside the disc are computed.
+    """
+
+    inside, x, y, z, edge = disc_geometry(size)
+
+    # viewer looks along -z, sun follows elongation (waxing Moon is lit on the right)
+    sun: float = math.radians(elongation)
+    lit: ndarray = numpy.clip(x * math.sin(sun) - z * math.cos(sun), 0, None)
+
+    # viewer frame -> selenographic frame, sub-Earth point is (libration_lat, long)
+    lat, long = math.radians(libration_lat), math.radians(libration_long)
+    tilted_y: ndarray = y * math.cos(lat) + z * math.sin(lat)
+    tilted_z: ndarray = z * math.cos(lat) - y * math.sin(lat)
+    surface: ndarray = numpy.stack(
+        [
+            x * math.cos(long) + tilted_z * math.sin(long),
+            tilted_y,
+            tilted_z * math.cos(long) - x * math.sin(long),
+        ]
+    )
+
+    albedo: ndarray = sample_albedo(surface)
+
+    brightness: ndarray = albedo * 2 * lit / numpy.maximum(lit + z, 1e-6)
+    brightness = numpy.maximum(numpy.clip(brightness, 0, 1), EARTHSHINE * albedo)
+
+    disc: ndarray = numpy.zeros((size, size), dtype=numpy.uint8)
+    disc[inside] = (brightness * edge * 255).round()
+    return disc
+
+
+@lru_cache(maxsize=settings.MOON_RENDER_CACHE_SIZE)
+def render_bucket(
+    bucket: Tuple[int, int, int],
+    size: int,
+    phase_step: float,
+    libration_step: Optional[float],
+) -> bytes:
+    """
+    PNG of phase bucket (see MoonRenderer.bucket). Cached per process at module
+    level, so MoonRenderer.render stays picklable for the "process" image executor.
+    """
+
+    elongation, libration_long, libration_lat = bucket
+    disc: ndarray = render_disc(
+        elongation * phase_step,
+        libration_long * (libration_step or 0),
+        libration_lat * (libration_step or 0),
+        size,
+    )
+    buffer: BytesIO = BytesIO()
+    Image.fromarray(disc, mode="L").save(buffer, "png", compress_level=1)
+    return buffer.getvalue()
+
+
+class MoonRenderer:
+    """
+    Renders Moon images offline. Renders are cached by phase bucket: elongation
+    and libration rounded to `phase_step` and `libration_step` degrees.
+    Without `libration_step` libration is not rendered, so buckets are phases only
+    (120 renders at default 3 degrees step cover every date).
+    Usage:
+        png: bytes = MoonRenderer().render(datetime.date(2023, 2, 20))
+    """
+
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        phase_step: Optional[float] = None,
+        libration_step: Optional[float] = None,
+    ) -> None:
+        self.size: int = size or settings.MOON_RENDER_SIZE
+        self.phase_step: float = phase_step or settings.MOON_PHASE_STEP
+        self.libration_step: Optional[float] = (
+            settings.MOON_LIBRATION_STEP if libration_step is None else libration_step
+        )
+
+    def bucket(self, phase: MoonPhase) -> Tuple[int, int, int]:
+        """Quantised (elongation, libration longitude, libration latitude)"""
+        elongation: int = round(phase.elongation / self.phase_step) % round(
+            360 / self.phase_step
+        )
+        if not self.libration_step:
+            return elongation, 0, 0
+        return (
+            elongation,
+            round(phase.libration_long / self.libration_step),
+            round(phase.libration_lat / self.libration_step),
+        )
+
+    def render(self, date: datetime.date) -> bytes:
+        """PNG image of the Moon at given date"""
+        return render_bucket(
+            self.bucket(moon_phase(date)),
+            self.size,
+            self.phase_step,
+            self.libration_step,
+        )
+
+    @property
+    def cache_hits(self) -> int:
+        """Render cache hits in this process (not in "process" executor workers)"""
+        return render_bucket.cache_info().hits
@@ -1,8 +1,9 @@
 import platform
-from datetime import timedelta, datetime
-from typing import Optional
+from datetime import timedelta, datetime, timezone
+from typing import Optional, Iterable, Dict, Any
 
 from selenium import webdriver
+from unidecode import unidecode
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 
@@ -16,7 +17,7 @@ class URLConfig:
     METEOGRAM_URL = (
         "http://www.meteo.pl/um/php/meteorogram_id_um.php?ntype=0u&id={id}"  # noqa
     )
-    MGRAM_URL = "http://www.meteo.pl/um/metco/mgram_pict.php?ntype=0u&row={act_y}&col={act_x}&lang=pl&uid={uuid}"  # noqa
+    MGRAM_URL = "http://www.meteo.pl/um/metco/mgram_pict.php?ntype=0u&row={act_y}&col={act_x}&lang=pl&uid={model_run}"  # noqa
     API_SUNRISE_URL = (
         "https://api.sunrise-sunset.org/json?lat={lat}&lng={long}&formatted=0"
     )
@@ -51,11 +52,42 @@ def start_driver():
     return webdriver.Chrome(settings.EXEC_CHROME_PATH, options=chrome_options)
 
 
+def normalize_city(city: str) -> str:
+    """Cache key for city name. Example: ' Kraków  Nowa Huta' -> 'krakow nowa huta'"""
+    return " ".join(unidecode(city).lower().split())
+
+
+def um_model_run(now: Optional[datetime] = None) -> str:
+    """
+    Latest published UM model run (UTC), example: '2023021906'.
+    Model runs start every UM_RUN_INTERVAL hours and are published UM_RUN_DELAY hours later.
+    """
+    now = now or datetime.now(timezone.utc)
+    published: datetime = now.astimezone(timezone.utc) - timedelta(
+        hours=settings.UM_RUN_DELAY
+    )
+    hour: int = published.hour - published.hour % settings.UM_RUN_INTERVAL
+    return f"{published.strftime('%Y%m%d')}{hour:02d}"
+
+
 def daterange(start_date: datetime.date, end_date: datetime.date):
     for n in range(int((end_date - start_date).days)):
         yield start_date + timedelta(n)
 
 
+def plan_urls(dates: Iterable, url: str) -> Dict[str, Any]:
+    """
+    Unique pages for dates. Url is formatted with year, month and day of every date,
+    placeholders it does not use are ignored, so all days of a month share month page.
+    Returns {url: first date using it}
+    """
+    urls: Dict[str, Any] = {}
+    for date in dates:
+        page: str = url.format(year=date.year, month=date.month, day=date.day)
+        urls.setdefault(page, date)
+    return urls
+
+
 def daterange_by_minutes(start_date: datetime.date, end_date: datetime.date):
     minutes = range(0, int((end_date - start_date).total_seconds() / 60))
     for minute in minutes:
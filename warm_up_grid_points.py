@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+from typing import List
+
+from logger import ColoredLogger, get_module_logger
+from use_cases.use_case import DiscordUseCase
+from utils.db_utils import DBConnectionHandler
+
+logger: ColoredLogger = get_module_logger("WARM_UP")
+
+
+def read_cities(args: argparse.Namespace) -> List[str]:
+    """City names from command line and from file (one name per line)"""
+
+    cities: List[str] = list(args.cities)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            cities.extend(line.strip() for line in f)
+    return [city for city in cities if city]
+
+
+def run_warm_up_script():
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Fill grid point store with ICM search results for given cities"
+    )
+    parser.add_argument("cities", nargs="*", help="city names")
+    parser.add_argument("-f", "--file", help="file with city names, one per line")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=2, help="parallel ICM searches"
+    )
+    args: argparse.Namespace = parser.parse_args()
+
+    async def main():
+        async with DBConnectionHandler():
+            summary: dict = await DiscordUseCase().warm_up_grid_points(
+                read_cities(args), concurrency=args.concurrency
+            )
+        logger.info(f"Grid point store warm-up finished: {summary}")
+
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run_warm_up_script()